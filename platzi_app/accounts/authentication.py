@@ -0,0 +1,40 @@
+"""
+Autenticación por token con la búsqueda token → usuario en caché.
+
+``TokenAuthentication`` de DRF consulta ``Token`` + ``User`` en cada petición
+a la API. Aquí el resultado se guarda en memoria del proceso durante
+``TOKEN_AUTH_CACHE_TTL`` segundos, y se descarta antes (ver
+``accounts.signals``) cuando se borra el token (``logout_api``) o se guarda
+el usuario (desactivación, cambio de contraseña). Los cambios hechos desde
+otro worker o con ``QuerySet.update`` llegan como mucho tras el TTL.
+"""
+import copy
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from fake_store_api.ttl_cache import TTLCache
+
+_tokens = TTLCache(maxsize=10000)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        en_cache = _tokens.get(key)
+        if en_cache is None:
+            en_cache = super().authenticate_credentials(key)
+            _tokens.set(key, en_cache, ttl=settings.TOKEN_AUTH_CACHE_TTL)
+        # Cada petición recibe su copia: lo que una vista cambie en
+        # request.user no debe verse en las demás
+        user, token = en_cache
+        return copy.copy(user), copy.copy(token)
+
+
+def olvidar_token(key):
+    _tokens.delete(key)
+
+
+def olvidar_tokens_de(user):
+    for key in Token.objects.filter(user_id=user.pk).values_list('key', flat=True):
+        _tokens.delete(key)
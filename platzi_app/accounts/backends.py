@@ -0,0 +1,45 @@
+"""
+Autenticación por nombre de usuario o por email.
+
+El usuario se busca con una sola consulta (``username`` o ``email``, los dos
+con índice) y la contraseña se comprueba una sola vez. Cuando no hay usuario
+también se calcula un hash, para que una cuenta inexistente no responda más
+rápido que una contraseña incorrecta.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+UserModel = get_user_model()
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    def buscar_usuario(self, identificador):
+        """
+        Devuelve el usuario cuyo ``username`` es ``identificador`` o, si no
+        hay ninguno y parece un email, el único usuario con ese email.
+        """
+        filtro = Q(**{UserModel.USERNAME_FIELD: identificador})
+        if '@' in identificador:
+            filtro |= Q(email=identificador)
+        candidatos = list(UserModel._default_manager.filter(filtro)[:3])
+
+        for usuario in candidatos:
+            if usuario.get_username() == identificador:
+                return usuario
+        # Un email repetido en varias cuentas no identifica a nadie
+        return candidatos[0] if len(candidatos) == 1 else None
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        usuario = self.buscar_usuario(username)
+        if usuario is None:
+            UserModel().set_password(password)
+            return None
+        if usuario.check_password(password) and self.user_can_authenticate(usuario):
+            return usuario
+        return None
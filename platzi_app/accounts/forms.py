@@ -1,7 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
 import re
 
@@ -124,7 +123,8 @@ class CustomUserRegistrationForm(UserCreationForm):
 
 class CustomAuthenticationForm(AuthenticationForm):
     """
-    Formulario personalizado para el inicio de sesión
+    Formulario personalizado para el inicio de sesión.
+    Acepta usuario o email (ver ``accounts.backends.EmailOrUsernameBackend``).
     """
     username = forms.CharField(
         max_length=254,
@@ -162,38 +162,3 @@ class CustomAuthenticationForm(AuthenticationForm):
             raise ValidationError('El nombre de usuario es requerido.')
         
         return username.strip()
-
-    def clean(self):
-        """
-        Validación personalizada del formulario de login
-        """
-        cleaned_data = super().clean()
-        username = cleaned_data.get('username')
-        password = cleaned_data.get('password')
-
-        if username is not None and password:
-            # Intentar autenticar con username normal primero
-            self.user_cache = authenticate(
-                self.request,
-                username=username,
-                password=password,
-            )
-            
-            # Si no funciona y parece un email, intentar encontrar el usuario por email
-            if self.user_cache is None and '@' in username:
-                try:
-                    user = User.objects.get(email=username)
-                    self.user_cache = authenticate(
-                        self.request,
-                        username=user.username,
-                        password=password,
-                    )
-                except User.DoesNotExist:
-                    pass
-
-            if self.user_cache is None:
-                raise self.get_invalid_login_error()
-            else:
-                self.confirm_login_allowed(self.user_cache)
-
-        return cleaned_data
\ No newline at end of file
@@ -0,0 +1,140 @@
+import csv
+import itertools
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Length
+from rest_framework.authtoken.models import Token
+
+from accounts import nombres_usuario
+
+# Dominio reservado (RFC 2606): identifica a los usuarios de prueba al borrarlos
+DOMINIO = 'loadtest.invalid'
+
+NOMBRES = ['Ana', 'Luis', 'María', 'Carlos', 'Lucía', 'Jorge', 'Sofía', 'Diego', 'Valentina', 'Mateo']
+APELLIDOS = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez', 'Torres', 'Flores']
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea usuarios de prueba en lote (para pruebas de carga y staging) o los borra con --delete. '
+        'Todos comparten la misma contraseña, cuyo hash se calcula una sola vez. '
+        'Los workers ven los nombres nuevos al instante solo con un backend de caché compartido; '
+        'con la caché en memoria, tras USERNAME_FILTER_TTL segundos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', nargs='?', type=int, default=0, help='Número de usuarios a crear.')
+        parser.add_argument('--prefix', default='loadtest', help='Prefijo de los nombres de usuario.')
+        parser.add_argument('--password', default='loadtest123', help='Contraseña de todos los usuarios.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Usuarios por INSERT.')
+        parser.add_argument('--tokens', action='store_true', help='Crear también un token de DRF por usuario.')
+        parser.add_argument('--output', help='CSV donde escribir username,email,token de los usuarios creados.')
+        parser.add_argument('--delete', action='store_true', help='Borrar los usuarios de prueba con ese prefijo.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que 0.')
+        if options['delete']:
+            borrados = self.borrar(options['prefix'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{borrados} usuarios de prueba borrados.'))
+        elif options['count'] > 0:
+            creados = self.crear(options)
+            self.stdout.write(self.style.SUCCESS(f'{creados} usuarios de prueba creados.'))
+        else:
+            raise CommandError('Indica cuántos usuarios crear o usa --delete.')
+        # bulk_create y los borrados en lote no envían señales. La versión en
+        # la caché de Django hace que los workers reconstruyan su filtro de
+        # nombres si comparten el backend de caché; si no, lo harán al
+        # cumplirse USERNAME_FILTER_TTL.
+        nombres_usuario.invalidar()
+
+    def con_prefijo(self, prefix):
+        # Solo la forma exacta que genera el comando: el prefijo ``load`` no
+        # incluye a ``loadtest000001``
+        return User.objects.filter(username__regex=rf'^{re.escape(prefix)}[0-9]{{6,}}$')
+
+    def usuarios(self, prefix):
+        return self.con_prefijo(prefix).filter(email__endswith=f'@{DOMINIO}')
+
+    def primer_numero(self, prefix):
+        """
+        Continúa la numeración después del sufijo más alto que ya existe, de
+        modo que los huecos que dejan los borrados no provocan choques.
+        """
+        ultimo = (
+            self.con_prefijo(prefix)
+            .order_by(Length('username').desc(), '-username')
+            .values_list('username', flat=True)
+            .first()
+        )
+        return 0 if ultimo is None else int(ultimo[len(prefix):]) + 1
+
+    def crear(self, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        inicio = self.primer_numero(prefix)
+        archivo = open(options['output'], 'w', newline='') if options['output'] else None
+        escritor = csv.writer(archivo) if archivo else None
+        if escritor:
+            escritor.writerow(['username', 'email', 'token'])
+
+        creados = 0
+        try:
+            numeros = iter(range(inicio, inicio + options['count']))
+            while lote := list(itertools.islice(numeros, options['batch_size'])):
+                creados += self.crear_lote(prefix, password, lote, options['tokens'], escritor)
+                self.stdout.write(f'{creados}/{options["count"]}')
+        finally:
+            if archivo:
+                archivo.close()
+        return creados
+
+    def crear_lote(self, prefix, password, numeros, tokens, escritor):
+        nuevos = []
+        for numero in numeros:
+            username = f'{prefix}{numero:06d}'
+            nuevos.append(User(
+                username=username,
+                email=f'{username}@{DOMINIO}',
+                first_name=NOMBRES[numero % len(NOMBRES)],
+                last_name=APELLIDOS[(numero // len(NOMBRES)) % len(APELLIDOS)],
+                password=password,
+            ))
+
+        with transaction.atomic():
+            User.objects.bulk_create(nuevos, ignore_conflicts=True)
+            # ignore_conflicts descarta en silencio los nombres que ya
+            # existían. El hash tiene una sal nueva en cada ejecución, así que
+            # solo las filas insertadas ahora lo comparten.
+            insertados = dict(
+                User.objects.filter(username__in=[user.username for user in nuevos], password=password)
+                .values_list('username', 'id')
+            )
+            claves = {}
+            if tokens:
+                Token.objects.bulk_create(
+                    [Token(key=Token.generate_key(), user_id=user_id) for user_id in insertados.values()],
+                    ignore_conflicts=True,
+                )
+                claves = dict(Token.objects.filter(user_id__in=insertados.values()).values_list('user__username', 'key'))
+
+        if escritor:
+            escritor.writerows(
+                [user.username, user.email, claves.get(user.username, '')]
+                for user in nuevos if user.username in insertados
+            )
+        return len(insertados)
+
+    def borrar(self, prefix, batch_size):
+        ids = list(self.usuarios(prefix).values_list('id', flat=True))
+        borrados = 0
+        for i in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                # Los tokens y carritos se borran en cascada
+                self.usuarios(prefix).filter(id__in=ids[i:i + batch_size]).delete()
+            borrados += len(ids[i:i + batch_size])
+        return borrados
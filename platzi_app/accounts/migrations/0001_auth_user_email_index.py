@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Índice sobre ``auth_user.email`` para el login por email
+    (``accounts.backends.EmailOrUsernameBackend``). ``auth_user`` es una
+    tabla de Django, así que el índice se crea con SQL.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS accounts_auth_user_email_idx ON auth_user (email);',
+            reverse_sql='DROP INDEX IF EXISTS accounts_auth_user_email_idx;',
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Índice sobre ``UPPER(username)`` para comprobar sin distinguir mayúsculas
+    si un nombre de usuario está ocupado (``accounts.nombres_usuario``).
+    """
+
+    dependencies = [
+        ('accounts', '0001_auth_user_email_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS accounts_auth_user_username_upper_idx ON auth_user (UPPER(username));',
+            reverse_sql='DROP INDEX IF EXISTS accounts_auth_user_username_upper_idx;',
+        ),
+    ]
@@ -0,0 +1,127 @@
+"""
+Comprobación rápida de si un nombre de usuario está ocupado.
+
+Cada proceso guarda un filtro de Bloom con los nombres existentes (en
+mayúsculas, porque la comparación no distingue mayúsculas). Si el filtro dice
+que un nombre no está, está libre y no hace falta consultar la base de datos;
+si dice que puede estar, se confirma con una consulta sobre el índice
+``UPPER(username)``.
+
+Los registros de este proceso se añaden al filtro al guardarse (ver
+``accounts.signals``). Los de otros workers se incorporan al reconstruirlo,
+cada ``USERNAME_FILTER_TTL`` segundos; hasta entonces un nombre recién
+registrado en otro worker puede aparecer como libre, y el registro lo rechaza
+igualmente por la restricción única.
+
+``invalidar`` (p. ej. tras altas o bajas en lote, que no envían señales)
+sube además una versión en la caché de Django y cada proceso reconstruye su
+filtro al ver que cambió. Con un backend de caché compartido (``CACHE_BACKEND``)
+llega a todos los workers en la siguiente comprobación; con la caché en
+memoria por defecto solo al propio proceso, y los demás esperan al TTL.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Value
+from django.db.models.functions import Upper
+
+# Probabilidad de que un nombre libre tenga que consultarse igualmente
+FALSOS_POSITIVOS = 0.01
+CLAVE_VERSION = 'nombres_usuario_version'
+
+
+class FiltroBloom:
+    def __init__(self, capacidad, falsos_positivos=FALSOS_POSITIVOS):
+        self.capacidad = max(capacidad, 1000)
+        self.bits = math.ceil(-self.capacidad * math.log(falsos_positivos) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.bits / self.capacidad * math.log(2)))
+        self.tabla = bytearray((self.bits + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        resumen = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(resumen[:8], 'little')
+        h2 = int.from_bytes(resumen[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def agregar(self, valor):
+        for posicion in self._posiciones(valor):
+            self.tabla[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.tabla[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(valor))
+
+    @property
+    def lleno(self):
+        return self.elementos > self.capacidad
+
+
+_lock = threading.Lock()
+_filtro = None
+_caduca = 0.0
+_version = None
+
+
+def _clave(username):
+    return username.upper()
+
+
+def _construir_filtro():
+    usuarios = get_user_model()._default_manager
+    # Margen para los registros que lleguen antes de la próxima reconstrucción
+    filtro = FiltroBloom(capacidad=usuarios.count() * 2)
+    for username in usuarios.values_list('username', flat=True).iterator(chunk_size=5000):
+        filtro.agregar(_clave(username))
+    return filtro
+
+
+def _filtro_vigente():
+    global _filtro, _caduca, _version
+    version = cache.get_or_set(CLAVE_VERSION, 0, timeout=None)
+    with _lock:
+        if _filtro is None or _filtro.lleno or _caduca <= time.monotonic() or _version != version:
+            _filtro = _construir_filtro()
+            _caduca = time.monotonic() + settings.USERNAME_FILTER_TTL
+            _version = version
+        return _filtro
+
+
+def usuario_ocupado(username):
+    """
+    ``True`` si ya existe un usuario con ese nombre, sin distinguir mayúsculas.
+    """
+    if _clave(username) not in _filtro_vigente():
+        return False
+    return get_user_model()._default_manager.annotate(
+        username_upper=Upper('username')
+    ).filter(username_upper=Upper(Value(username))).exists()
+
+
+def registrar_nombre(username):
+    """
+    Añade un nombre al filtro de este proceso (si ya está construido).
+    """
+    with _lock:
+        if _filtro is not None:
+            _filtro.agregar(_clave(username))
+
+
+def invalidar():
+    """
+    Descarta el filtro de este proceso y, a través de la versión en la caché
+    de Django, el de los procesos que comparten esa caché. Cada uno lo
+    reconstruye en su próxima comprobación.
+    """
+    global _filtro
+    with _lock:
+        _filtro = None
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, timeout=None)
@@ -79,7 +79,7 @@ class UserLoginSerializer(serializers.Serializer):
     """
     username = serializers.CharField(
         max_length=255,
-        help_text='Nombre de usuario para iniciar sesión'
+        help_text='Nombre de usuario o email para iniciar sesión'
     )
     password = serializers.CharField(
         style={'input_type': 'password'},
@@ -95,7 +95,8 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
         
         if username and password:
-            # Intentamos autenticar al usuario
+            # Intentamos autenticar al usuario (por usuario o email, ver
+            # accounts.backends.EmailOrUsernameBackend)
             user = authenticate(
                 request=self.context.get('request'),
                 username=username,
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, nombres_usuario
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def registrar_nombre_usuario(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Mantiene al día el filtro de nombres ocupados al crear o renombrar usuarios.
+    Los guardados que no tocan el nombre (p. ej. ``last_login`` en cada inicio
+    de sesión) no cuentan: llenarían el filtro y adelantarían su reconstrucción.
+    """
+    if not created and update_fields is not None and instance.USERNAME_FIELD not in update_fields:
+        return
+    nombres_usuario.registrar_nombre(instance.get_username())
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def olvidar_tokens_del_usuario(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Un usuario guardado puede haber cambiado de contraseña o quedado inactivo:
+    sus tokens en caché dejan de valer. Al borrar un usuario sus tokens se
+    borran en cascada y los olvida ``olvidar_token_borrado``.
+    """
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    authentication.olvidar_tokens_de(instance)
+
+
+@receiver(post_delete, sender=Token)
+def olvidar_token_borrado(sender, instance, **kwargs):
+    authentication.olvidar_token(instance.key)
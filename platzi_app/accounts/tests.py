@@ -1,3 +1,194 @@
+import csv
+import io
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import authenticate, base_user
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from . import authentication, nombres_usuario
+from .management.commands import provision_users
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', email='ana@example.com', password='secreta123')
+
+    def contar_hashes(self):
+        """
+        Cuenta las veces que se calcula un hash de contraseña.
+        """
+        make_password = mock.patch.object(base_user, 'make_password', wraps=base_user.make_password)
+        check_password = mock.patch.object(base_user, 'check_password', wraps=base_user.check_password)
+        make, check = make_password.start(), check_password.start()
+        self.addCleanup(make_password.stop)
+        self.addCleanup(check_password.stop)
+        return lambda: make.call_count + check.call_count
+
+    def test_usuario_o_email_con_una_consulta_y_un_hash(self):
+        for identificador in ('ana', 'ana@example.com', 'nadie@example.com'):
+            with self.subTest(identificador=identificador):
+                hashes = self.contar_hashes()
+                with self.assertNumQueries(1):
+                    user = authenticate(username=identificador, password='secreta123')
+                self.assertEqual(user, self.user if identificador != 'nadie@example.com' else None)
+                self.assertEqual(hashes(), 1)
+
+    def test_el_username_gana_y_un_email_repetido_no_identifica(self):
+        otro = User.objects.create_user('ana@example.com', password='otra12345')
+        self.assertEqual(authenticate(username='ana@example.com', password='otra12345'), otro)
+
+        User.objects.create_user('luis', email='compartido@example.com', password='secreta123')
+        User.objects.create_user('eva', email='compartido@example.com', password='secreta123')
+        self.assertIsNone(authenticate(username='compartido@example.com', password='secreta123'))
+
+    def test_rechaza_contraseña_incorrecta_y_usuario_inactivo(self):
+        self.assertIsNone(authenticate(username='ana@example.com', password='incorrecta'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(authenticate(username='ana', password='secreta123'))
+
+    def test_login_html_y_api_por_email(self):
+        hashes = self.contar_hashes()
+        response = self.client.post(reverse('accounts:login'), {'username': 'ana@example.com', 'password': 'secreta123'})
+        self.assertRedirects(response, reverse('fake_store_api:inicio'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+        self.assertEqual(hashes(), 1)
+
+        response = self.client.post(reverse('accounts:api_login'), {'username': 'ana@example.com', 'password': 'secreta123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'ana')
+
+
+class DisponibilidadUsuarioTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('Ana', password='secreta123')
+        nombres_usuario.invalidar()
+        self.addCleanup(nombres_usuario.invalidar)
+        self.url = reverse('accounts:api_check_username')
+
+    def disponible(self, username):
+        return self.client.get(self.url, {'username': username}).json()['available']
+
+    def test_nombres_libres_sin_consultar_la_base_de_datos(self):
+        self.assertFalse(self.disponible('ana'))  # construye el filtro
+        with self.assertNumQueries(0):
+            for i in range(50):
+                self.assertTrue(self.disponible(f'nuevo{i}'))
+
+    def test_el_registro_actualiza_el_filtro(self):
+        self.assertTrue(self.disponible('Luis'))
+        response = self.client.post(reverse('accounts:api_register'), {
+            'username': 'luis', 'email': 'luis@example.com', 'password': 'secreta123', 'password2': 'secreta123',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.disponible('LUIS'))
+
+    def test_invalidar_desde_otro_proceso(self):
+        self.assertTrue(self.disponible('masivo'))
+        User.objects.bulk_create([User(username='masivo')])
+        # Otro proceso (p. ej. provision_users) solo puede subir la versión compartida
+        cache.incr(nombres_usuario.CLAVE_VERSION)
+        self.assertFalse(self.disponible('masivo'))
+
+    def test_iniciar_sesion_no_llena_el_filtro(self):
+        self.disponible('ana')
+        elementos = nombres_usuario._filtro.elementos
+        for _ in range(3):
+            self.assertTrue(self.client.login(username='Ana', password='secreta123'))
+        self.assertEqual(nombres_usuario._filtro.elementos, elementos)
+
+    def test_filtro_de_bloom(self):
+        filtro = nombres_usuario.FiltroBloom(capacidad=1000)
+        for i in range(1000):
+            filtro.agregar(f'USUARIO{i}')
+        self.assertTrue(all(f'USUARIO{i}' in filtro for i in range(1000)))
+        falsos = sum(f'OTRO{i}' in filtro for i in range(10000))
+        self.assertLess(falsos, 300)
+
+
+class TokenEnCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='secreta123')
+        self.token = Token.objects.create(user=self.user)
+        authentication._tokens.clear()
+        self.addCleanup(authentication._tokens.clear)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+
+    def perfil(self):
+        return self.client.get(reverse('accounts:api_profile'), **self.auth)
+
+    def test_sin_consultas_de_autenticacion_con_el_token_en_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.perfil().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.perfil().json()['user']['username'], 'ana')
+
+    def test_logout_invalida_el_token(self):
+        self.perfil()
+        self.assertEqual(self.client.post(reverse('accounts:api_logout'), **self.auth).status_code, 200)
+        self.assertEqual(self.perfil().status_code, 401)
+
+    def test_desactivar_o_cambiar_la_contraseña_invalida_el_token(self):
+        self.perfil()
+        self.user.set_password('nueva12345')
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.perfil().status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.perfil().status_code, 401)
+
+
+class ProvisionUsersTests(TestCase):
+    def test_crea_en_lotes_con_un_solo_hash_y_los_borra(self):
+        User.objects.create_user('loadtest_real', email='real@example.com', password='secreta123')
+
+        with tempfile.NamedTemporaryFile('r', suffix='.csv') as salida, \
+                mock.patch.object(provision_users, 'make_password', wraps=provision_users.make_password) as make_password:
+            call_command('provision_users', 25, '--tokens', '--batch-size', '10', '--output', salida.name, stdout=io.StringIO())
+            filas = list(csv.DictReader(salida))
+
+        self.assertEqual(make_password.call_count, 1)
+        self.assertEqual(len(filas), 25)
+        self.assertEqual(Token.objects.filter(user__username__startswith='loadtest0').count(), 25)
+        self.assertEqual(Token.objects.get(key=filas[3]['token']).user.username, 'loadtest000003')
+        self.assertIsNotNone(authenticate(username=filas[0]['email'], password='loadtest123'))
+
+        call_command('provision_users', '--delete', stdout=io.StringIO())
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['loadtest_real'])
+        self.assertFalse(Token.objects.exists())
+
+    def test_no_cuenta_ni_exporta_usuarios_que_ya_existian(self):
+        call_command('provision_users', 3, stdout=io.StringIO())
+        User.objects.filter(username='loadtest000001').delete()
+        # Numeración a partir del sufijo más alto, no del número de usuarios
+        call_command('provision_users', 1, stdout=io.StringIO())
+        self.assertTrue(User.objects.filter(username='loadtest000003').exists())
+
+        Token.objects.create(user=User.objects.get(username='loadtest000000'))
+        salida_comando = io.StringIO()
+        with tempfile.NamedTemporaryFile('r', suffix='.csv') as salida, \
+                mock.patch.object(provision_users.Command, 'primer_numero', return_value=0):
+            call_command('provision_users', 2, '--tokens', '--output', salida.name, stdout=salida_comando)
+            filas = list(csv.DictReader(salida))
+
+        self.assertIn('1 usuarios de prueba creados', salida_comando.getvalue())
+        self.assertEqual([fila['username'] for fila in filas], ['loadtest000001'])
+        self.assertTrue(Token.objects.filter(key=filas[0]['token'], user__username='loadtest000001').exists())
 
-# Create your tests here.
+    def test_delete_solo_borra_el_prefijo_exacto(self):
+        call_command('provision_users', 2, stdout=io.StringIO())
+        call_command('provision_users', 2, '--prefix', 'load', stdout=io.StringIO())
+        call_command('provision_users', '--delete', '--prefix', 'load', stdout=io.StringIO())
+        self.assertEqual(
+            list(User.objects.order_by('username').values_list('username', flat=True)),
+            ['loadtest000000', 'loadtest000001'],
+        )
@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
@@ -11,7 +11,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
-from django.contrib.auth.models import User
+from . import nombres_usuario
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 
 # VISTAS HTML (para interfaz web)
@@ -56,21 +56,18 @@ def login_view(request):
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
+            # El formulario ya autenticó al usuario (por usuario o email)
+            user = form.get_user()
+            login(request, user)
+            messages.success(
+                request,
+                f'¡Bienvenido de nuevo, {user.first_name or user.username}!'
+            )
             
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(
-                    request,
-                    f'¡Bienvenido de nuevo, {user.first_name or user.username}!'
-                )
-                
-                next_url = request.GET.get('next')
-                if next_url:
-                    return redirect(next_url)
-                return redirect('fake_store_api:inicio')
+            next_url = request.GET.get('next')
+            if next_url:
+                return redirect(next_url)
+            return redirect('fake_store_api:inicio')
         else:
             messages.error(
                 request,
@@ -202,7 +199,7 @@ def check_username_api(request):
             'error': 'Parámetro username requerido'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    exists = User.objects.filter(username__iexact=username).exists()
+    exists = nombres_usuario.usuario_ocupado(username)
     
     return Response({
         'success': True,
@@ -0,0 +1,4 @@
+"""
+Benchmarks de la aplicación contra un servidor local que imita la API de
+Platzi. Ver ``python -m benchmarks --help``.
+"""
@@ -0,0 +1,209 @@
+"""
+Ejecuta los benchmarks contra el servidor falso de Platzi:
+
+    python -m benchmarks                       # todos los escenarios
+    python -m benchmarks --latency 0.1 --error-rate 0.05 --scenarios catalogo_anonimo,carrito
+    python -m benchmarks --compare benchmarks/baseline.json
+    python -m benchmarks --save benchmarks/baseline.json
+
+Usa una base de datos SQLite temporal (como los tests), así que no toca
+``db.sqlite3``. Entre escenarios se vacían las cachés del proceso para que
+cada uno empiece en frío.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'platzi_store_app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+from rest_framework.throttling import SimpleRateThrottle  # noqa: E402
+
+from accounts import authentication, nombres_usuario  # noqa: E402
+from fake_store_api import catalog, imagenes, platzi_client, throttling  # noqa: E402
+
+from .escenarios import ESCENARIOS, Sesion  # noqa: E402
+from .fake_platzi import ServidorPlatziFalso  # noqa: E402
+
+PASSWORD = 'benchmark123'
+METRICAS_MENOR_ES_MEJOR = ['p50_ms', 'p95_ms', 'p99_ms', 'upstream_per_request', 'error_rate']
+
+
+class Entorno:
+    def __init__(self, servidor, productos, usuarios, tokens):
+        self.servidor = servidor
+        self.productos = productos
+        self.usuarios = usuarios
+        self.tokens = tokens
+        self.password = PASSWORD
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def reiniciar_estado(servidor):
+    catalog.invalidar_categorias()
+    catalog._productos_cache.clear()
+    catalog._ultimas_respuestas.clear()
+    imagenes._resultados.clear()
+    platzi_client.reset_breakers()
+    authentication._tokens.clear()
+    nombres_usuario.invalidar()
+    throttling.almacen().limpiar()
+    cache.clear()
+    servidor.reiniciar_contadores()
+
+
+def ejecutar_escenario(nombre, entorno, iteraciones, concurrencia):
+    funcion, iniciar_sesion = ESCENARIOS[nombre]
+    medidas = []
+    reiniciar_estado(entorno.servidor)
+
+    def trabajador(w):
+        try:
+            sesion = Sesion(medidas, entorno.usuarios[w], entorno.tokens[w], iniciar_sesion=iniciar_sesion)
+            for i in range(w, iteraciones, concurrencia):
+                funcion(sesion, i, entorno)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        list(executor.map(trabajador, range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(segundos * 1000 for segundos, _ in medidas)
+    errores = sum(not ok for _, ok in medidas)
+    llamadas = dict(sorted(entorno.servidor.llamadas.items()))
+    total_llamadas = sum(llamadas.values())
+    return {
+        'requests': len(medidas),
+        'errors': errores,
+        'error_rate': round(errores / len(medidas), 4) if medidas else 0,
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'throughput_rps': round(len(medidas) / duracion, 1) if duracion else 0,
+        'upstream_calls': total_llamadas,
+        'upstream_per_request': round(total_llamadas / len(medidas), 3) if medidas else 0,
+        'upstream': llamadas,
+    }
+
+
+def imprimir(resultados):
+    columnas = ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'upstream_calls', 'upstream_per_request']
+    print(f"{'escenario':<18}" + ''.join(f'{columna:>22}' for columna in columnas))
+    for nombre, metricas in resultados.items():
+        print(f'{nombre:<18}' + ''.join(f'{metricas[columna]:>22}' for columna in columnas))
+
+
+def comparar(resultados, base, tolerancia):
+    """
+    Imprime las diferencias con la línea base y devuelve cuántas métricas
+    empeoraron más de ``tolerancia`` (fracción).
+    """
+    regresiones = 0
+    print(f'\nComparación con la línea base (tolerancia {tolerancia:.0%}):')
+    for nombre, metricas in resultados.items():
+        anteriores = base.get('results', {}).get(nombre)
+        if anteriores is None:
+            print(f'  {nombre}: sin línea base')
+            continue
+        metricas_a_comparar = METRICAS_MENOR_ES_MEJOR + ['throughput_rps']
+        for metrica in metricas_a_comparar:
+            antes, ahora = anteriores.get(metrica), metricas[metrica]
+            if antes is None or antes == ahora:
+                continue
+            cambio = (ahora - antes) / antes if antes else float('inf')
+            peor = cambio > tolerancia if metrica in METRICAS_MENOR_ES_MEJOR else cambio < -tolerancia
+            regresiones += peor
+            marca = '  REGRESIÓN' if peor else ''
+            print(f'  {nombre:<18} {metrica:<22} {antes:>10} -> {ahora:<10} ({cambio:+.0%}){marca}')
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--products', type=int, default=200, help='Productos del servidor falso.')
+    parser.add_argument('--categories', type=int, default=5, help='Categorías del servidor falso.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Segundos de latencia por llamada a la API.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de llamadas a la API que fallan con 500.')
+    parser.add_argument('--requests', type=int, default=40, help='Iteraciones por escenario.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Clientes simultáneos.')
+    parser.add_argument('--scenarios', default=','.join(ESCENARIOS), help='Escenarios separados por comas.')
+    parser.add_argument('--save', help='Guardar los resultados como JSON (p. ej. la línea base).')
+    parser.add_argument('--compare', help='Comparar con un JSON guardado antes.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Empeoramiento permitido al comparar.')
+    args = parser.parse_args(argv)
+
+    escenarios = [nombre.strip() for nombre in args.scenarios.split(',') if nombre.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    configuracion = {
+        'products': args.products, 'categories': args.categories, 'latency': args.latency,
+        'error_rate': args.error_rate, 'requests': args.requests, 'concurrency': args.concurrency,
+    }
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio, \
+            ServidorPlatziFalso(args.products, args.categories, args.latency, args.error_rate) as servidor:
+        setup_test_environment()
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directorio, 'benchmark.sqlite3')
+        nombre_original = connection.creation.create_test_db(verbosity=0)
+        # Los límites de peticiones medirían al propio benchmark
+        sin_limites = {scope: '1000000/s' for scope in ('anon', 'user', 'platzi')}
+        try:
+            with override_settings(PLATZI_API_BASE_URL=servidor.url_api, CATALOG_SOURCE='api',
+                                   CATALOG_STREAMING=False, IMAGE_CHECK_DEFERRED=False,
+                                   SINGLE_FLIGHT_LOCK_DIR='',
+                                   THROTTLE_DB_PATH=os.path.join(directorio, 'throttle.sqlite3')), \
+                    mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, sin_limites):
+                usuarios, tokens = [], []
+                for w in range(args.concurrency):
+                    usuario = User.objects.create_user(f'bench{w}', email=f'bench{w}@example.com', password=PASSWORD)
+                    usuarios.append(usuario)
+                    tokens.append(Token.objects.create(user=usuario).key)
+                entorno = Entorno(servidor, args.products, usuarios, tokens)
+
+                for nombre in escenarios:
+                    resultados[nombre] = ejecutar_escenario(nombre, entorno, args.requests, args.concurrency)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+    print(f'Configuración: {json.dumps(configuracion)}\n')
+    imprimir(resultados)
+
+    regresiones = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'config': configuracion, 'results': resultados}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'\nResultados guardados en {args.save}')
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Escenarios del benchmark.
+
+Cada escenario es una función ``(sesion, i, entorno)`` que hace una iteración
+del flujo con ``sesion`` (un cliente de Django por hilo, ya autenticado si el
+escenario lo necesita). Cada petición se mide por separado.
+"""
+import time
+
+from django.http import StreamingHttpResponse
+from django.test import Client
+from django.urls import reverse
+
+FILTROS_CATALOGO = [
+    {},
+    {'q': 'Producto 1'},
+    {'category': 2},
+    {'sort': 'price'},
+    {'min_price': 100, 'max_price': 500, 'sort': '-title'},
+]
+
+
+class Sesion:
+    """
+    Cliente de Django que mide cada petición y comprueba su código de estado.
+    """
+    def __init__(self, medidas, usuario=None, token=None, iniciar_sesion=False):
+        self.client = Client()
+        self.medidas = medidas
+        self.usuario = usuario
+        self.token = token
+        if iniciar_sesion:
+            self.client.force_login(usuario)
+
+    def pedir(self, metodo, url, esperado=(200,), **kwargs):
+        inicio = time.perf_counter()
+        response = getattr(self.client, metodo)(url, **kwargs)
+        if isinstance(response, StreamingHttpResponse):
+            b''.join(response.streaming_content)
+        self.medidas.append((time.perf_counter() - inicio, response.status_code in esperado))
+        return response
+
+
+def catalogo_anonimo(sesion, i, entorno):
+    sesion.pedir('get', reverse('fake_store_api:obtener_productos'), data={'page': i % 5 + 1})
+
+
+def catalogo_filtros(sesion, i, entorno):
+    filtros = FILTROS_CATALOGO[i % len(FILTROS_CATALOGO)]
+    sesion.pedir('get', reverse('fake_store_api:obtener_productos'), data=filtros)
+
+
+def api_productos(sesion, i, entorno):
+    sesion.pedir('get', reverse('fake_store_api:api_products'), data={'limit': 20, 'fields': 'id,title,price'})
+    producto_id = i % entorno.productos + 1
+    sesion.pedir('get', reverse('fake_store_api:api_product', args=[producto_id]))
+
+
+def crud_productos(sesion, i, entorno):
+    titulo = f'Bench {sesion.usuario.username} {i}'
+    datos = {
+        'titulo': titulo,
+        'precio': 10 + i,
+        'descripcion': 'Producto creado por el benchmark',
+        'categoria': 1,
+        'imagen1': entorno.servidor.url_imagen(i % 20),
+    }
+    sesion.pedir('post', reverse('fake_store_api:agregar_producto_api'), data=datos, esperado=(302,))
+    producto_id = entorno.servidor.id_por_titulo(titulo)
+    if producto_id is None:
+        sesion.medidas.append((0, False))
+        return
+    sesion.pedir('get', reverse('fake_store_api:editar_producto_con_id', args=[producto_id]))
+    sesion.pedir('post', reverse('fake_store_api:editar_producto_api'),
+                 data={**datos, 'id': producto_id, 'precio': 20 + i}, esperado=(302,))
+    sesion.pedir('post', reverse('fake_store_api:eliminar_producto', args=[producto_id]))
+
+
+def carrito(sesion, i, entorno):
+    ids = [(i * 3 + k) % entorno.productos + 1 for k in range(3)]
+    for producto_id in ids:
+        sesion.pedir('get', reverse('fake_store_api:add_to_cart', args=[producto_id]), esperado=(302,))
+    sesion.pedir('get', reverse('fake_store_api:cart'))
+    sesion.pedir('post', reverse('fake_store_api:api_cart'), content_type='application/json', data={'operations': [
+        {'op': 'set', 'product_id': ids[0], 'quantity': 2},
+        {'op': 'remove', 'product_id': ids[1]},
+        {'op': 'add', 'product_id': ids[2], 'quantity': 1},
+    ]})
+    sesion.pedir('get', reverse('fake_store_api:api_cart'))
+
+
+def auth_api(sesion, i, entorno):
+    usuario = sesion.usuario
+    identificador = usuario.username if i % 2 else usuario.email
+    sesion.pedir('post', reverse('accounts:api_login'), data={'username': identificador, 'password': entorno.password})
+    sesion.pedir('get', reverse('accounts:api_check_username'), data={'username': f'libre_{usuario.pk}_{i}'})
+    sesion.pedir('get', reverse('accounts:api_check_username'), data={'username': usuario.username.upper()})
+    sesion.pedir('get', reverse('accounts:api_profile'), HTTP_AUTHORIZATION=f'Token {sesion.token}')
+
+
+# nombre: (función, con la sesión del usuario iniciada)
+ESCENARIOS = {
+    'catalogo_anonimo': (catalogo_anonimo, False),
+    'catalogo_filtros': (catalogo_filtros, True),
+    'api_productos': (api_productos, False),
+    'crud_productos': (crud_productos, True),
+    'carrito': (carrito, True),
+    'auth_api': (auth_api, False),
+}
@@ -0,0 +1,209 @@
+"""
+Servidor local que imita la API de Platzi para los benchmarks.
+
+Responde ``/api/v1/products`` (paginado con ``page``/``limit`` u
+``offset``/``limit``), ``/api/v1/products/<id>`` (GET, PUT, DELETE),
+``POST /api/v1/products/``, ``/api/v1/categories`` y las imágenes
+``/img/<id>.jpg`` que referencian los productos. Cada respuesta espera
+``latencia`` segundos y falla con un 500 con probabilidad ``errores``.
+
+Cuenta las llamadas por endpoint (``GET products/{id}``, ...) para que cada
+escenario informe cuántas llamadas hizo a la API.
+"""
+import json
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PREFIJO = '/api/v1/'
+NOMBRES_CATEGORIAS = ['Clothes', 'Electronics', 'Furniture', 'Shoes', 'Others', 'Toys', 'Books', 'Sports']
+
+
+def _ahora():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class ServidorPlatziFalso:
+    def __init__(self, productos=200, categorias=5, latencia=0.0, errores=0.0, semilla=1):
+        self.latencia = latencia
+        self.errores = errores
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.llamadas = Counter()
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._manejador())
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+        fecha = _ahora()
+        self.categorias = [
+            {
+                'id': i,
+                'name': NOMBRES_CATEGORIAS[(i - 1) % len(NOMBRES_CATEGORIAS)] + ('' if i <= len(NOMBRES_CATEGORIAS) else f' {i}'),
+                'slug': f'categoria-{i}',
+                'image': self.url_imagen(f'c{i}'),
+                'creationAt': fecha,
+                'updatedAt': fecha,
+            }
+            for i in range(1, categorias + 1)
+        ]
+        self.productos = {}
+        self._siguiente_id = 1
+        for _ in range(productos):
+            self._crear({
+                'title': f'Producto {self._siguiente_id}',
+                'price': self._azar.randint(5, 900),
+                'description': f'Descripción del producto {self._siguiente_id}',
+                'categoryId': self._azar.randint(1, categorias),
+                'images': [self.url_imagen(self._siguiente_id)],
+            })
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f'http://{host}:{puerto}'
+
+    @property
+    def url_api(self):
+        return self.url + PREFIJO
+
+    def url_imagen(self, nombre):
+        host, puerto = self._servidor.server_address[:2]
+        return f'http://{host}:{puerto}/img/{nombre}.jpg'
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name='platzi-falso', daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def reiniciar_contadores(self):
+        with self._lock:
+            self.llamadas.clear()
+
+    def id_por_titulo(self, titulo):
+        with self._lock:
+            for producto in self.productos.values():
+                if producto['title'] == titulo:
+                    return producto['id']
+        return None
+
+    # DATOS
+    def _categoria(self, categoria_id):
+        for categoria in self.categorias:
+            if categoria['id'] == categoria_id:
+                return categoria
+        return self.categorias[0]
+
+    def _crear(self, datos):
+        fecha = _ahora()
+        producto = {
+            'id': self._siguiente_id,
+            'title': datos['title'],
+            'slug': f"producto-{self._siguiente_id}",
+            'price': datos['price'],
+            'description': datos.get('description', ''),
+            'category': self._categoria(datos.get('categoryId')),
+            'images': datos.get('images') or [],
+            'creationAt': fecha,
+            'updatedAt': fecha,
+        }
+        self.productos[producto['id']] = producto
+        self._siguiente_id += 1
+        return producto
+
+    def _actualizar(self, producto, datos):
+        for campo in ('title', 'price', 'description', 'images'):
+            if campo in datos:
+                producto[campo] = datos[campo]
+        if 'categoryId' in datos:
+            producto['category'] = self._categoria(datos['categoryId'])
+        producto['updatedAt'] = _ahora()
+        return producto
+
+    # HTTP
+    def responder(self, metodo, ruta, consulta, cuerpo):
+        """
+        Devuelve ``(estado, datos)`` para una petición ya contada.
+        """
+        partes = ruta[len(PREFIJO):].strip('/').split('/')
+        with self._lock:
+            if partes == ['categories'] and metodo == 'GET':
+                return 200, self.categorias
+            if partes == ['products'] and metodo == 'GET':
+                limite = int(consulta.get('limit', ['10'])[0])
+                if 'offset' in consulta:
+                    inicio = int(consulta['offset'][0])
+                else:
+                    inicio = (int(consulta.get('page', ['1'])[0]) - 1) * limite
+                return 200, list(self.productos.values())[inicio:inicio + limite]
+            if partes == ['products'] and metodo == 'POST':
+                return 201, self._crear(cuerpo)
+            if len(partes) == 2 and partes[0] == 'products' and partes[1].isdigit():
+                producto = self.productos.get(int(partes[1]))
+                if producto is None:
+                    return 404, {'message': 'Could not find any entity of type "Product"'}
+                if metodo == 'GET':
+                    return 200, producto
+                if metodo == 'PUT':
+                    return 200, self._actualizar(producto, cuerpo)
+                if metodo == 'DELETE':
+                    del self.productos[producto['id']]
+                    return 200, True
+        return 404, {'message': f'Cannot {metodo} {ruta}'}
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _enviar(self, estado, cuerpo=b'', tipo='application/json'):
+                self.send_response(estado)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(cuerpo)
+
+            def _atender(self):
+                partes = urlsplit(self.path)
+                largo = int(self.headers.get('Content-Length') or 0)
+                cuerpo = json.loads(self.rfile.read(largo) or b'null') if largo else {}
+
+                if partes.path.startswith('/img/'):
+                    endpoint = f'{self.command} img'
+                else:
+                    segmentos = ['{id}' if s.isdigit() else s for s in partes.path[len(PREFIJO):].strip('/').split('/')]
+                    endpoint = f"{self.command} {'/'.join(segmentos)}"
+                with servidor._lock:
+                    servidor.llamadas[endpoint] += 1
+                    falla = servidor._azar.random() < servidor.errores
+
+                if servidor.latencia:
+                    threading.Event().wait(servidor.latencia)
+                if falla:
+                    return self._enviar(500, b'{"message": "Internal server error"}')
+                if partes.path.startswith('/img/'):
+                    return self._enviar(200, b'\xff\xd8\xff\xd9', 'image/jpeg')
+
+                estado, datos = servidor.responder(self.command, partes.path, parse_qs(partes.query), cuerpo)
+                self._enviar(estado, json.dumps(datos).encode())
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _atender
+
+        return Manejador
@@ -1,3 +1,34 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Cart, CartItem, Category, Product, ProductImage
+
+
+class ProductImageInline(admin.TabularInline):
+    model = ProductImage
+    extra = 0
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'slug']
+    search_fields = ['name']
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ['id', 'title', 'price', 'category', 'synced_at']
+    list_filter = ['category']
+    search_fields = ['title']
+    inlines = [ProductImageInline]
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'updated_at']
+    search_fields = ['user__username']
+    inlines = [CartItemInline]
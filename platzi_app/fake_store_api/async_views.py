@@ -0,0 +1,242 @@
+"""
+Versiones asíncronas de las vistas que llaman a la API de Platzi.
+
+Se activan con ``PLATZI_ASYNC_VIEWS`` y están pensadas para servirse con un
+servidor ASGI, por ejemplo:
+
+    gunicorn -k uvicorn.workers.UvicornWorker platzi_store_app.asgi:application
+
+Mientras esperan a la API no ocupan ningún hilo, y las llamadas que no
+dependen entre sí se lanzan a la vez con ``asyncio.gather``. El render de
+templates y el acceso a la base de datos siguen siendo síncronos y se
+ejecutan con ``sync_to_async``.
+"""
+import asyncio
+import json
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+
+from . import carrito, catalog, imagenes, platzi_client, streaming
+from .forms import AgregarProductoForm, CatalogoFiltroForm
+from .models import Product
+from .throttling import limitar
+from .views import (
+    contexto_catalogo, etag_para, guardar_pagina, pagina_en_cache, poner_validadores, respuesta_no_modificada,
+)
+
+arender = sync_to_async(render)
+aetag_para = sync_to_async(etag_para)
+arespuesta_no_modificada = sync_to_async(respuesta_no_modificada)
+apagina_en_cache = sync_to_async(pagina_en_cache)
+aguardar_pagina = sync_to_async(guardar_pagina)
+
+
+async def _preparar_formulario(request):
+    """
+    Crea el formulario de producto con los datos del POST dejando antes en
+    caché, de forma asíncrona, todo lo que su validación pediría a la red.
+    """
+    tareas = [catalog.aprecargar_categorias()]
+    imagen = request.POST.get('imagen1', '')
+    if imagen and not settings.IMAGE_CHECK_DEFERRED:
+        tareas.append(imagenes.acomprobar_imagen(imagen))
+    await asyncio.gather(*tareas)
+
+    form = await sync_to_async(AgregarProductoForm)(request.POST)
+    es_valido = await sync_to_async(form.is_valid)()
+    if not es_valido:
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f'{field}: {error}')
+    return form, es_valido
+
+
+# VISTAS PÚBLICAS
+@limitar
+async def obtener_productos(request):
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Solo se permiten solicitudes GET'}, status=405)
+
+    en_cache = await apagina_en_cache(request)
+    if en_cache is not None:
+        return en_cache
+
+    filtro_form = CatalogoFiltroForm(request.GET)
+    filtros = filtro_form.get_filtros()
+    if settings.CATALOG_STREAMING and not catalog.usar_catalogo_local():
+        response = await streaming.arespuesta_streaming(request, filtro_form, filtros)
+        if response is not None:
+            return response
+
+    try:
+        page_obj, categories, obsoleto, version = await catalog.aobtener_pagina_catalogo(filtros, request.GET.get('page'))
+    except httpx.HTTPError as e:
+        contexto = {
+            'success': False,
+            'error_message': f'Error al conectar con la API: {e}'
+        }
+        return await arender(request, 'obtener_producto.html', contexto, status=500)
+
+    # etag_para ya carga request.user en un hilo; después se puede leer aquí
+    # Solo ETag, como la vista síncrona
+    etag = await aetag_para(request, version, obsoleto)
+    no_modificada = await arespuesta_no_modificada(request, etag, None)
+    if no_modificada is not None:
+        return no_modificada
+
+    contexto = contexto_catalogo(page_obj, categories, filtro_form, filtros, obsoleto)
+    response = await arender(request, 'obtener_producto.html', contexto)
+    poner_validadores(response, etag, None, privada=request.user.is_authenticated)
+    if not obsoleto:
+        await aguardar_pagina(request, response, None)
+    return response
+
+
+# VISTAS PROTEGIDAS
+@login_required
+@limitar
+async def agregar_producto(request):
+    await catalog.aprecargar_categorias()
+    form = await sync_to_async(AgregarProductoForm)()
+    return await arender(request, 'agregar_producto.html', {'form': form})
+
+
+@login_required
+@limitar
+async def agregar_producto_api(request):
+    if request.method != 'POST':
+        return redirect('fake_store_api:agregar_producto')
+
+    form, es_valido = await _preparar_formulario(request)
+    if es_valido:
+        try:
+            response = await platzi_client.apost("products/", json=form.get_api_data())
+            response.raise_for_status()
+            await sync_to_async(catalog.registrar_producto)(response.json())
+
+            messages.success(request, '¡Producto agregado exitosamente!')
+            return redirect('fake_store_api:obtener_productos')
+        except httpx.HTTPError as e:
+            messages.error(request, f'Error al conectar con la API: {str(e)}')
+
+    return await arender(request, 'agregar_producto.html', {'form': form})
+
+
+@login_required
+@limitar
+async def editar_producto(request, producto_id=None):
+    if producto_id is None:
+        return redirect('fake_store_api:obtener_productos')
+
+    try:
+        producto_data, _ = await asyncio.gather(
+            catalog.aobtener_producto(producto_id),
+            catalog.aprecargar_categorias(),
+        )
+    except (httpx.HTTPError, Product.DoesNotExist):
+        messages.error(request, 'Error al obtener el producto.')
+        return redirect('fake_store_api:obtener_productos')
+
+    if producto_data.get('stale'):
+        messages.warning(request, 'La API no está disponible: se muestran los últimos datos guardados del producto.')
+
+    version = catalog.version_de([producto_data])
+    etag = await aetag_para(request, version, 'editar_producto')
+    no_modificada = await arespuesta_no_modificada(request, etag, version[1])
+    if no_modificada is not None:
+        return no_modificada
+
+    form = await sync_to_async(AgregarProductoForm)(
+        initial=AgregarProductoForm.initial_desde_producto(producto_data)
+    )
+    contexto = {
+        'form': form,
+        'producto_id': producto_id,
+        'producto_data': producto_data,
+        'es_edicion': True
+    }
+    response = await arender(request, 'editar_producto.html', contexto)
+    return poner_validadores(response, etag, version[1], privada=True)
+
+
+@login_required
+@limitar
+async def editar_producto_api(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Solo POST'}, status=405)
+
+    producto_id = request.POST.get('id')
+    if not producto_id:
+        messages.error(request, 'ID del producto requerido.')
+        return redirect('fake_store_api:editar_producto')
+
+    form, es_valido = await _preparar_formulario(request)
+    if es_valido:
+        try:
+            response = await platzi_client.aput(f"products/{producto_id}", json=form.get_api_data())
+            response.raise_for_status()
+            await sync_to_async(catalog.registrar_producto)(response.json())
+
+            messages.success(request, '¡Producto actualizado exitosamente!')
+            return redirect('fake_store_api:obtener_productos')
+        except httpx.HTTPError as e:
+            messages.error(request, f'Error al conectar con la API: {str(e)}')
+
+    contexto = {
+        'form': form,
+        'producto_id': producto_id,
+        'es_edicion': True
+    }
+    return await arender(request, 'editar_producto.html', contexto)
+
+
+@login_required
+@limitar
+async def eliminar_producto(request, producto_id=None):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Solo se permiten solicitudes POST'}, status=405)
+
+    if not producto_id:
+        try:
+            producto_id = json.loads(request.body).get('id')
+        except json.JSONDecodeError:
+            pass
+
+    if not producto_id:
+        return JsonResponse({'error': 'ID del producto requerido'}, status=400)
+
+    try:
+        response = await platzi_client.adelete(f"products/{producto_id}")
+    except httpx.HTTPError as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    if response.status_code == 200:
+        await sync_to_async(catalog.olvidar_producto)(producto_id)
+        return JsonResponse({'success': True, 'message': '¡Producto eliminado exitosamente!'}, status=200)
+    elif response.status_code == 404:
+        return JsonResponse({'error': 'Producto no encontrado'}, status=404)
+    return JsonResponse({'error': f'Error al eliminar: {response.status_code}'}, status=response.status_code)
+
+
+# CARRITO
+@login_required
+@limitar
+async def add_to_cart(request, product_id):
+    user = await request.auser()
+    await sync_to_async(carrito.importar_de_sesion)(request)
+    if not await sync_to_async(carrito.incrementar)(user, product_id):
+        try:
+            product = await catalog.aobtener_producto(product_id)
+        except (httpx.HTTPError, Product.DoesNotExist):
+            messages.error(request, 'Error al obtener el producto.')
+            return redirect('fake_store_api:obtener_productos')
+        await sync_to_async(carrito.agregar_producto)(user, product)
+
+    messages.success(request, 'Producto agregado al carrito.')
+    return redirect('fake_store_api:obtener_productos')
@@ -0,0 +1,172 @@
+"""
+Carrito de compras guardado en la base de datos (``Cart`` / ``CartItem``).
+
+Antes el carrito era un diccionario en ``request.session['cart']`` y con
+``SESSION_SAVE_EVERY_REQUEST`` la sesión se reescribía en cada petición.
+Ahora cada cambio toca solo la línea afectada, las cantidades se suman en
+la propia base de datos (``quantity = quantity + 1``) y los totales salen
+de una consulta agregada.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Sum
+
+from . import catalog
+from .models import Cart, CartItem
+
+
+def obtener_carrito(user):
+    return Cart.objects.get_or_create(user=user)[0]
+
+
+def lineas(user):
+    return CartItem.objects.filter(cart__user=user)
+
+
+def incrementar(user, product_id, cantidad=1):
+    """
+    Suma ``cantidad`` a la línea del producto si ya está en el carrito.
+    Devuelve ``False`` si no estaba.
+    """
+    return lineas(user).filter(product_id=product_id).update(quantity=F('quantity') + cantidad) > 0
+
+
+def agregar_producto(user, producto, cantidad=1):
+    """
+    Agrega un producto con la forma de la API, o suma a su línea si ya está.
+    Es seguro con peticiones simultáneas del mismo usuario: ningún
+    incremento se pierde.
+    """
+    if incrementar(user, producto['id'], cantidad):
+        return
+    try:
+        with transaction.atomic():
+            _crear_linea(user, producto, cantidad)
+    except IntegrityError:
+        # Otra petición creó la línea entre medias (restricción única de
+        # cart + product_id): se suma a la suya
+        incrementar(user, producto['id'], cantidad)
+
+
+def _crear_linea(user, producto, cantidad):
+    CartItem.objects.create(
+        cart=obtener_carrito(user),
+        product_id=producto['id'],
+        title=producto['title'],
+        price=producto['price'],
+        image=producto['images'][0] if producto.get('images') else '',
+        quantity=cantidad,
+    )
+
+
+def cambiar_cantidad(user, product_id, cantidad):
+    return lineas(user).filter(product_id=product_id).update(quantity=cantidad) > 0
+
+
+def quitar(user, product_id):
+    return lineas(user).filter(product_id=product_id).delete()[0] > 0
+
+
+def aplicar_operaciones(user, operaciones):
+    """
+    Aplica en una transacción una lista de ``{'op', 'product_id', 'quantity'}``
+    (ver ``CartOperationSerializer``). Los productos que todavía no están en el
+    carrito se piden al catálogo todos juntos antes de empezar. Devuelve los
+    ids de los productos que no se pudieron agregar porque no existen.
+    """
+    existentes = set(lineas(user).values_list('product_id', flat=True))
+    nuevos = [
+        operacion['product_id'] for operacion in operaciones
+        if operacion['op'] != 'remove' and operacion['quantity'] > 0
+        and operacion['product_id'] not in existentes
+    ]
+    productos = catalog.obtener_productos_por_id(nuevos) if nuevos else {}
+
+    no_encontrados = []
+    with transaction.atomic():
+        for operacion in operaciones:
+            product_id = operacion['product_id']
+            cantidad = operacion['quantity']
+            if operacion['op'] == 'remove' or (operacion['op'] == 'set' and cantidad == 0):
+                quitar(user, product_id)
+                existentes.discard(product_id)
+            elif product_id in existentes:
+                if operacion['op'] == 'add':
+                    incrementar(user, product_id, cantidad)
+                else:
+                    cambiar_cantidad(user, product_id, cantidad)
+            elif product_id in productos and cantidad > 0:
+                agregar_producto(user, productos[product_id], cantidad)
+                existentes.add(product_id)
+            elif cantidad > 0:
+                no_encontrados.append(product_id)
+    return no_encontrados
+
+
+def actualizar_precios(user):
+    """
+    Pone en cada línea el precio actual del catálogo. Los productos se piden
+    todos juntos a ``catalog.obtener_productos_por_id`` (copia local o caché,
+    y el resto en paralelo), y las líneas que cambian se guardan con un solo
+    ``bulk_update``. Devuelve ``{product_id: precio_anterior}`` de las líneas
+    que cambiaron de precio.
+
+    Los productos que no se pudieron obtener, o de los que solo hay una copia
+    obsoleta, conservan el precio que tenían.
+    """
+    items = list(lineas(user).only('id', 'product_id', 'price'))
+    if not items:
+        return {}
+    productos = catalog.obtener_productos_por_id([item.product_id for item in items])
+
+    cambiados = []
+    anteriores = {}
+    for item in items:
+        producto = productos.get(item.product_id)
+        if producto is None or producto.get('stale') or producto['price'] == item.price:
+            continue
+        anteriores[item.product_id] = item.price
+        item.price = producto['price']
+        cambiados.append(item)
+    if cambiados:
+        CartItem.objects.bulk_update(cambiados, ['price'])
+    return anteriores
+
+
+def contar_lineas(user):
+    return lineas(user).count()
+
+
+def totales(user):
+    """
+    Devuelve ``{'total', 'unidades', 'lineas'}`` en una sola consulta.
+    """
+    resultado = lineas(user).aggregate(
+        total=Sum(F('price') * F('quantity'), output_field=FloatField()),
+        unidades=Sum('quantity'),
+        lineas=Count('id'),
+    )
+    return {
+        'total': resultado['total'] or 0,
+        'unidades': resultado['unidades'] or 0,
+        'lineas': resultado['lineas'],
+    }
+
+
+def importar_de_sesion(request):
+    """
+    Pasa a la base de datos el carrito que un usuario tenga todavía en la
+    sesión (formato anterior) y lo borra de ella. Las líneas que ya existen
+    no se tocan, así que dos peticiones simultáneas no lo importan dos veces.
+    """
+    antiguo = request.session.get('cart')
+    if antiguo is None:
+        return
+    carrito = obtener_carrito(request.user)
+    for product_id, item in antiguo.items():
+        CartItem.objects.get_or_create(cart=carrito, product_id=int(product_id), defaults={
+            'title': item['title'],
+            'price': item['price'],
+            'image': item.get('image') or '',
+            'quantity': item['quantity'],
+        })
+    del request.session['cart']
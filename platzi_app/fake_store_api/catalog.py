@@ -0,0 +1,898 @@
+"""
+Acceso al catálogo de productos.
+
+Las vistas leen productos y categorías a través de este módulo. Según
+``CATALOG_SOURCE`` los datos salen de la API de Platzi ('api') o de la copia
+local que llena ``python manage.py sync_catalog`` ('local').
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_datetime
+
+from . import imagenes, platzi_client
+from .models import Category, Product, ProductImage
+from .single_flight import SingleFlight
+from .ttl_cache import TTLCache
+
+PAGE_LIMIT = 100
+
+_categorias_cache = TTLCache()
+
+# Las descargas idénticas que coinciden en el tiempo comparten una sola llamada
+_en_curso = SingleFlight()
+
+# Última respuesta buena de la API para servirla, marcada como obsoleta,
+# mientras la API no está disponible (p. ej. con el circuito abierto)
+_ultimas_respuestas = TTLCache(maxsize=10)
+
+# Productos por id (LRU con TTL). Las entradas caducadas que aún no se han
+# descartado sirven de copia obsoleta si la API no responde.
+_productos_cache = TTLCache(maxsize=settings.PRODUCT_CACHE_MAX_ENTRIES)
+
+
+def usar_catalogo_local():
+    return settings.CATALOG_SOURCE == 'local'
+
+
+# RESPALDO CON LA ÚLTIMA RESPUESTA BUENA
+def _api_no_disponible(error):
+    """
+    ``True`` si el error indica una caída de la API (sin respuesta o 5xx) y
+    no un error propio de la petición como un 404.
+    """
+    response = getattr(error, 'response', None)
+    return response is None or response.status_code >= 500
+
+
+def _guardar_respaldo(clave, valor):
+    _ultimas_respuestas.set(clave, valor, ttl=settings.PLATZI_STALE_TTL)
+
+
+def _respaldo_o_error(copia, error):
+    if copia is None or not _api_no_disponible(error):
+        raise error
+    return copia
+
+
+# CACHÉ DE PRODUCTOS POR ID
+def _producto_completo(producto):
+    return all(campo in producto for campo in ('id', 'title', 'price', 'images')) \
+        and isinstance(producto.get('category'), dict)
+
+
+def cachear_producto(producto):
+    _productos_cache.set(int(producto['id']), producto, ttl=settings.PRODUCT_CACHE_TTL)
+
+
+def descachear_producto(producto_id):
+    _productos_cache.delete(int(producto_id))
+
+
+def producto_en_cache(producto_id, allow_stale=False):
+    return _productos_cache.get(int(producto_id), allow_stale=allow_stale)
+
+
+# LECTURA DESDE LA API
+def descargar_pagina(page):
+    response = platzi_client.get("products", params={'page': page, 'limit': PAGE_LIMIT})
+    response.raise_for_status()
+    return response.json()
+
+
+def obtener_producto_api(producto_id):
+    def descargar():
+        response = platzi_client.get(f"products/{producto_id}")
+        response.raise_for_status()
+        return response.json()
+    return _en_curso.do(f'producto:{producto_id}', descargar)
+
+
+def descargar_categorias():
+    def descargar():
+        response = platzi_client.get("categories", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    return _en_curso.do('categorias', descargar)
+
+
+def obtener_categorias_api():
+    """
+    Categorías de la API con caché de ``PLATZI_CATEGORIES_CACHE_TTL`` segundos
+    compartida por todo el proceso. Si la API falla se sirve la última copia
+    conocida aunque haya caducado; solo se lanza el error si nunca se obtuvo.
+    """
+    categorias = _categorias_cache.get('categorias')
+    if categorias is not None:
+        return categorias
+    try:
+        categorias = descargar_categorias()
+    except requests.exceptions.RequestException:
+        categorias = _categorias_cache.get('categorias', allow_stale=True)
+        if categorias is None:
+            raise
+        return categorias
+    _categorias_cache.set('categorias', categorias, ttl=settings.PLATZI_CATEGORIES_CACHE_TTL)
+    return categorias
+
+
+def invalidar_categorias():
+    _categorias_cache.clear()
+
+
+def _categorias_del_catalogo():
+    # Como antes, una respuesta de error de /categories no impide mostrar productos
+    try:
+        return obtener_categorias_api()
+    except requests.exceptions.HTTPError:
+        return []
+
+
+def descargar_catalogo():
+    """
+    Descarga todas las páginas de ``/products`` y ``/categories`` en paralelo,
+    con como mucho ``PLATZI_API_MAX_CONCURRENCY`` peticiones a la vez.
+
+    Las páginas se piden de forma especulativa por delante de la que se está
+    leyendo y se concatenan en orden hasta la primera página incompleta, así
+    que el resultado es el mismo que recorrerlas una a una.
+
+    Si otra petición (o, con ``SINGLE_FLIGHT_LOCK_DIR``, otro worker) ya está
+    descargando el catálogo, espera a esa descarga en lugar de repetirla.
+    """
+    productos, categorias = _en_curso.do('catalogo', _descargar_catalogo, archivos=True)
+    return productos, categorias
+
+
+def _paginas_en_orden(executor, concurrencia):
+    """
+    Genera en orden las páginas de ``/products`` hasta la primera incompleta,
+    con ``concurrencia`` páginas pedidas por delante en ``executor``.
+    """
+    pendientes = {}
+    siguiente = 1
+
+    def lanzar_pagina():
+        nonlocal siguiente
+        pendientes[siguiente] = executor.submit(descargar_pagina, siguiente)
+        siguiente += 1
+
+    for _ in range(concurrencia):
+        lanzar_pagina()
+
+    page = 1
+    while True:
+        data = pendientes.pop(page).result()
+        yield data
+        if len(data) < PAGE_LIMIT:
+            return
+        page += 1
+        lanzar_pagina()
+
+
+def _descargar_catalogo(al_llegar=None):
+    concurrencia = max(1, settings.PLATZI_API_MAX_CONCURRENCY)
+    executor = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='platzi-catalogo')
+    try:
+        categorias_future = executor.submit(_categorias_del_catalogo)
+        all_products = []
+        for data in _paginas_en_orden(executor, concurrencia):
+            all_products.extend(data)
+            if al_llegar is not None:
+                al_llegar(data)
+        return all_products, categorias_future.result()
+    finally:
+        # Las páginas especulativas posteriores a la última ya no hacen falta.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _descargar_y_guardar(al_llegar):
+    productos, categorias = _descargar_catalogo(al_llegar)
+    _guardar_catalogo_descargado(productos, categorias)
+    return productos, categorias
+
+
+def _paginas_restantes(productos, enviados):
+    # Al unirse a una descarga ya empezada las páginas llegan juntas al final
+    for inicio in range(enviados, len(productos), PAGE_LIMIT):
+        yield productos[inicio:inicio + PAGE_LIMIT]
+
+
+def descargar_catalogo_por_paginas():
+    """
+    Como ``descargar_catalogo`` pero genera cada página de productos en
+    cuanto llega, para ir mostrándola.
+
+    La descarga es la misma que la de ``descargar_catalogo`` y corre en su
+    propio hilo: las peticiones que coinciden la comparten y, aunque se deje
+    de leer el generador, termina y queda como última copia buena.
+    """
+    cola = queue.SimpleQueue()
+
+    def descargar():
+        try:
+            resultado = _en_curso.do('catalogo', lambda: _descargar_y_guardar(
+                lambda data: cola.put(('pagina', data))
+            ), archivos=True)
+        except Exception as e:
+            cola.put(('error', e))
+        else:
+            cola.put(('fin', resultado))
+
+    threading.Thread(target=descargar, name='platzi-catalogo', daemon=True).start()
+    enviados = 0
+    while True:
+        tipo, valor = cola.get()
+        if tipo == 'error':
+            raise valor
+        if tipo == 'fin':
+            yield from _paginas_restantes(valor[0], enviados)
+            return
+        enviados += len(valor)
+        yield valor
+
+
+def descarga_en_curso():
+    """
+    ``True`` si este proceso ya está descargando el catálogo completo.
+    """
+    return _en_curso.en_curso('catalogo')
+
+
+def hay_copia_del_catalogo():
+    return _ultimas_respuestas.get('catalogo') is not None
+
+
+# LECTURA DESDE LA COPIA LOCAL
+def obtener_categorias():
+    """
+    Categorías para formularios y filtros: de la base de datos en modo local
+    o de la caché de la API en otro caso.
+    """
+    if usar_catalogo_local():
+        return [categoria.as_api_dict() for categoria in Category.objects.all()]
+    return obtener_categorias_api()
+
+
+def productos_locales():
+    return Product.objects.select_related('category').prefetch_related('images')
+
+
+def obtener_catalogo():
+    """
+    Devuelve ``(productos, categorias)`` como listas de diccionarios con la
+    forma de la API, vengan de la red o de la base de datos local.
+    """
+    if usar_catalogo_local():
+        productos = [producto.as_api_dict() for producto in productos_locales()]
+        return productos, obtener_categorias()
+    return descargar_catalogo()
+
+
+def filtrar_productos(productos, filtros):
+    """
+    Aplica en memoria a los productos de la API los mismos filtros y orden
+    que ``filtrar_productos_locales`` aplica en la base de datos.
+    """
+    q = filtros['q'].lower()
+    categoria = filtros['category']
+    min_price = filtros['min_price']
+    max_price = filtros['max_price']
+
+    resultado = [
+        producto for producto in productos
+        if (not q or q in (producto.get('title') or '').lower())
+        and (categoria is None or (producto.get('category') or {}).get('id') == categoria)
+        and (min_price is None or (producto.get('price') or 0) >= min_price)
+        and (max_price is None or (producto.get('price') or 0) <= max_price)
+    ]
+
+    orden = filtros['sort']
+    if orden.lstrip('-') == 'title':
+        resultado.sort(key=lambda producto: (producto.get('title') or '').lower(), reverse=orden.startswith('-'))
+    elif orden.lstrip('-') == 'price':
+        resultado.sort(key=lambda producto: producto.get('price') or 0, reverse=orden.startswith('-'))
+    return resultado
+
+
+def sin_imagenes_rotas(productos):
+    """
+    Quita de productos con la forma de la API las imágenes que se comprobaron
+    rotas (en la copia local ya lo hace ``ProductImage.is_broken``). Solo se
+    copian los productos que cambian; las copias en caché no se tocan, así que
+    la imagen vuelve si una comprobación posterior pasa.
+    """
+    rotas = imagenes.imagenes_rotas({url for producto in productos for url in producto.get('images') or []})
+    if not rotas:
+        return productos
+    return [
+        {**producto, 'images': [url for url in producto['images'] if url not in rotas]}
+        if rotas.intersection(producto.get('images') or []) else producto
+        for producto in productos
+    ]
+
+
+def _sin_imagenes_rotas(producto):
+    return sin_imagenes_rotas([producto])[0]
+
+
+def filtrar_productos_locales(filtros):
+    queryset = productos_locales()
+    if filtros['q']:
+        queryset = queryset.filter(title__icontains=filtros['q'])
+    if filtros['category'] is not None:
+        queryset = queryset.filter(category_id=filtros['category'])
+    if filtros['min_price'] is not None:
+        queryset = queryset.filter(price__gte=filtros['min_price'])
+    if filtros['max_price'] is not None:
+        queryset = queryset.filter(price__lte=filtros['max_price'])
+
+    orden = filtros['sort']
+    if orden:
+        campo = Lower('title') if orden.lstrip('-') == 'title' else F('price')
+        queryset = queryset.order_by(campo.desc() if orden.startswith('-') else campo.asc(), 'id')
+    return queryset
+
+
+def descargar_catalogo_con_respaldo():
+    """
+    Como ``descargar_catalogo``, pero si la API no está disponible devuelve la
+    última copia buena. Devuelve ``(productos, categorias, obsoleto)``.
+    """
+    try:
+        productos, categorias = descargar_catalogo()
+    except requests.exceptions.RequestException as e:
+        productos, categorias = _respaldo_o_error(_ultimas_respuestas.get('catalogo'), e)
+        return productos, categorias, True
+    _guardar_catalogo_descargado(productos, categorias)
+    return productos, categorias, False
+
+
+def _guardar_catalogo_descargado(productos, categorias):
+    # Cada producto de la lista queda también en la caché por id, así que
+    # editar_producto o add_to_cart después de ver el catálogo no llaman a la API
+    _guardar_respaldo('catalogo', (productos, categorias))
+    for producto in productos:
+        if _producto_completo(producto):
+            cachear_producto(producto)
+
+
+def obtener_pagina_catalogo(filtros, page):
+    """
+    Devuelve ``(page_obj, categorias, obsoleto, version)`` con una sola página
+    de productos ya filtrada y ordenada. ``page_obj.object_list`` contiene
+    diccionarios con la forma de la API. En modo local solo se leen de la base
+    de datos las filas de la página pedida. ``obsoleto`` indica que la API no
+    respondió y los datos son la última copia buena. ``version`` es la de
+    ``version_de`` o ``version_local``.
+    """
+    if usar_catalogo_local():
+        paginator = Paginator(filtrar_productos_locales(filtros), filtros['page_size'])
+        page_obj = paginator.get_page(page)
+        page_obj.object_list = [producto.as_api_dict() for producto in page_obj.object_list]
+        return page_obj, obtener_categorias(), False, version_local()
+
+    productos, categorias, obsoleto = descargar_catalogo_con_respaldo()
+    productos = sin_imagenes_rotas(productos)
+    paginator = Paginator(filtrar_productos(productos, filtros), filtros['page_size'])
+    return paginator.get_page(page), categorias, obsoleto, version_de(productos, categorias)
+
+
+# VERSIÓN DEL CATÁLOGO (ETag / Last-Modified)
+def _huella(*partes):
+    return hashlib.sha1(json.dumps(partes, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def version_de(productos, categorias=()):
+    """
+    Devuelve ``(huella, ultima_modificacion)`` de productos con la forma de la
+    API. La huella cambia si cambia algún id, ``updatedAt``, imagen o categoría
+    (un producto sin ``updatedAt`` entra completo); ``ultima_modificacion`` es el
+    ``updatedAt`` más reciente, o ``None``.
+    """
+    firmas = []
+    ultima = None
+    for producto in productos:
+        actualizado = producto.get('updatedAt')
+        firmas.append([producto.get('id'), actualizado, producto.get('images')] if actualizado else producto)
+        fecha = parse_datetime(actualizado) if actualizado else None
+        if fecha is not None and (ultima is None or fecha > ultima):
+            ultima = fecha
+    return _huella(firmas, list(categorias)), ultima
+
+
+def version_local():
+    """
+    Equivalente de ``version_de`` para la copia local, con agregados en lugar
+    de leer las filas: el número de productos y la suma de sus ids cambian al
+    añadir o borrar, el ``updated_at`` máximo al editar.
+    """
+    productos = Product.objects.aggregate(
+        total=Count('id'), ids=Sum('id'), ultima=Max('updated_at'),
+    )
+    categorias = Category.objects.aggregate(
+        total=Count('id'), ids=Sum('id'), ultima=Max('updated_at'),
+    )
+    imagenes_rotas = ProductImage.objects.filter(is_broken=True).count()
+    ultima = max((fecha for fecha in (productos['ultima'], categorias['ultima']) if fecha), default=None)
+    return _huella(productos, categorias, imagenes_rotas), ultima
+
+
+# RECORRIDO POR CURSOR (API JSON)
+def _valor_orden(producto, orden):
+    campo = orden.lstrip('-')
+    if campo == 'title':
+        return (producto.get('title') or '').lower()
+    if campo == 'price':
+        return producto.get('price') or 0
+    return None
+
+
+def codificar_cursor(posicion):
+    return base64.urlsafe_b64encode(json.dumps(posicion).encode()).decode().rstrip('=')
+
+
+def leer_cursor(cursor, orden):
+    """
+    Devuelve la posición ``[valor, id]`` que guarda ``cursor``. Lanza
+    ``ValueError`` si el cursor no es válido para el orden pedido.
+    """
+    try:
+        valor, producto_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Cursor inválido') from e
+    tipos = {'title': (str,), 'price': (int, float)}.get(orden.lstrip('-'), (type(None),))
+    if not isinstance(valor, tipos) or not isinstance(producto_id, int) or isinstance(valor, bool):
+        raise ValueError('Cursor inválido')
+    return [valor, producto_id]
+
+
+def _va_despues(posicion, despues, orden):
+    valor, producto_id = posicion
+    valor_cursor, id_cursor = despues
+    if valor == valor_cursor:
+        return producto_id > id_cursor
+    return valor < valor_cursor if orden.startswith('-') else valor > valor_cursor
+
+
+def _recorrer_productos_api(productos, filtros, despues, limite):
+    # Mismo orden que la copia local: el campo pedido y el id como desempate
+    orden = filtros['sort']
+    productos = sorted(filtrar_productos(productos, {**filtros, 'sort': ''}), key=lambda producto: producto['id'])
+    if orden:
+        productos.sort(key=lambda producto: _valor_orden(producto, orden), reverse=orden.startswith('-'))
+
+    entregados = 0
+    for producto in productos:
+        posicion = [_valor_orden(producto, orden), producto['id']]
+        if despues is not None and not _va_despues(posicion, despues, orden):
+            continue
+        yield producto, posicion
+        entregados += 1
+        if entregados == limite:
+            return
+
+
+def _recorrer_productos_locales(filtros, despues, limite):
+    orden = filtros['sort']
+    queryset = filtrar_productos_locales({**filtros, 'sort': ''})
+    if not orden:
+        queryset = queryset.order_by('id')
+        if despues is not None:
+            queryset = queryset.filter(id__gt=despues[1])
+    else:
+        campo = Lower('title') if orden.lstrip('-') == 'title' else F('price')
+        descendente = orden.startswith('-')
+        queryset = queryset.annotate(valor_orden=campo).order_by(
+            '-valor_orden' if descendente else 'valor_orden', 'id'
+        )
+        if despues is not None:
+            valor, producto_id = despues
+            mayor_o_menor = 'valor_orden__lt' if descendente else 'valor_orden__gt'
+            queryset = queryset.filter(Q(**{mayor_o_menor: valor}) | Q(valor_orden=valor, id__gt=producto_id))
+
+    for producto in queryset[:limite].iterator(chunk_size=limite):
+        yield producto.as_api_dict(), [getattr(producto, 'valor_orden', None), producto.id]
+
+
+def recorrer_productos(filtros, despues=None, limite=PAGE_LIMIT):
+    """
+    Devuelve ``(productos, obsoleto)``. ``productos`` es un generador de
+    pares ``(producto, posicion)`` con como mucho ``limite`` productos
+    filtrados y ordenados según ``filtros['sort']`` (con el id como
+    desempate), a partir de la posición ``despues`` de un cursor anterior.
+    En modo local solo se leen de la base de datos esas filas.
+    """
+    if usar_catalogo_local():
+        return _recorrer_productos_locales(filtros, despues, limite), False
+
+    productos, _, obsoleto = descargar_catalogo_con_respaldo()
+    return _recorrer_productos_api(sin_imagenes_rotas(productos), filtros, despues, limite), obsoleto
+
+
+def obtener_producto(producto_id):
+    """
+    Devuelve un producto por id, de la caché si hay una copia vigente.
+    Lanza ``requests.RequestException`` si falla la API o
+    ``Product.DoesNotExist`` si no está en la copia local. Si la API no está
+    disponible se devuelve la última copia conocida con ``stale: True``.
+    """
+    if usar_catalogo_local():
+        return productos_locales().get(pk=producto_id).as_api_dict()
+
+    producto = producto_en_cache(producto_id)
+    if producto is not None:
+        return _sin_imagenes_rotas(producto)
+    try:
+        producto = obtener_producto_api(producto_id)
+    except requests.exceptions.RequestException as e:
+        copia = _respaldo_o_error(producto_en_cache(producto_id, allow_stale=True), e)
+        return {**_sin_imagenes_rotas(copia), 'stale': True}
+    cachear_producto(producto)
+    return _sin_imagenes_rotas(producto)
+
+
+def _producto_o_none(producto_id):
+    try:
+        return obtener_producto(producto_id)
+    except requests.exceptions.RequestException:
+        return None
+
+
+def obtener_productos_por_id(ids):
+    """
+    Devuelve ``{id: producto}`` para listas armadas a partir de productos
+    sueltos (p. ej. el carrito). Los que están en caché no cuestan nada; el
+    resto se pide en paralelo con como mucho ``PLATZI_API_MAX_CONCURRENCY``
+    peticiones a la vez. Los que no existen o fallan se omiten.
+    """
+    ids = list(dict.fromkeys(int(producto_id) for producto_id in ids))
+    if usar_catalogo_local():
+        return {producto.id: producto.as_api_dict() for producto in productos_locales().filter(pk__in=ids)}
+
+    encontrados = {}
+    faltantes = []
+    for producto_id in ids:
+        producto = producto_en_cache(producto_id)
+        if producto is None:
+            faltantes.append(producto_id)
+        else:
+            encontrados[producto_id] = producto
+
+    if faltantes:
+        concurrencia = min(max(1, settings.PLATZI_API_MAX_CONCURRENCY), len(faltantes))
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='platzi-productos') as executor:
+            for producto_id, producto in zip(faltantes, executor.map(_producto_o_none, faltantes)):
+                if producto is not None:
+                    encontrados[producto_id] = producto
+    return dict(zip(encontrados, sin_imagenes_rotas(list(encontrados.values()))))
+
+
+# LECTURA ASÍNCRONA (vistas de async_views.py)
+async def adescargar_pagina(page, semaforo):
+    async with semaforo:
+        response = await platzi_client.aget("products", params={'page': page, 'limit': PAGE_LIMIT})
+    response.raise_for_status()
+    return response.json()
+
+
+async def _adescargar_categorias():
+    response = await platzi_client.aget("categories", timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+async def aobtener_categorias_api():
+    """
+    Equivalente asíncrono de ``obtener_categorias_api``; comparte la caché.
+    """
+    categorias = _categorias_cache.get('categorias')
+    if categorias is not None:
+        return categorias
+    try:
+        categorias = await _en_curso.ado('categorias', _adescargar_categorias)
+    except httpx.HTTPError:
+        categorias = _categorias_cache.get('categorias', allow_stale=True)
+        if categorias is None:
+            raise
+        return categorias
+    _categorias_cache.set('categorias', categorias, ttl=settings.PLATZI_CATEGORIES_CACHE_TTL)
+    return categorias
+
+
+async def aprecargar_categorias():
+    """
+    Deja las categorías en caché para que ``AgregarProductoForm`` no tenga que
+    pedirlas de forma bloqueante. Si falla, el formulario usa las de respaldo.
+    """
+    if usar_catalogo_local():
+        return
+    try:
+        await aobtener_categorias_api()
+    except httpx.HTTPError:
+        pass
+
+
+async def _acategorias_del_catalogo(semaforo):
+    try:
+        async with semaforo:
+            return await aobtener_categorias_api()
+    except httpx.HTTPStatusError:
+        return []
+
+
+async def adescargar_catalogo():
+    """
+    Equivalente asíncrono de ``descargar_catalogo``: mismas páginas
+    especulativas y mismo orden, con un semáforo en lugar de hilos, y la
+    misma agrupación de descargas simultáneas.
+    """
+    productos, categorias = await _en_curso.ado('catalogo', _adescargar_catalogo, archivos=True)
+    return productos, categorias
+
+
+async def _apaginas_en_orden(semaforo, concurrencia):
+    pendientes = {}
+    siguiente = 1
+
+    def lanzar_pagina():
+        nonlocal siguiente
+        pendientes[siguiente] = asyncio.ensure_future(adescargar_pagina(siguiente, semaforo))
+        siguiente += 1
+
+    try:
+        for _ in range(concurrencia):
+            lanzar_pagina()
+
+        page = 1
+        while True:
+            data = await pendientes.pop(page)
+            yield data
+            if len(data) < PAGE_LIMIT:
+                return
+            page += 1
+            lanzar_pagina()
+    finally:
+        for task in pendientes.values():
+            task.cancel()
+
+
+async def _adescargar_catalogo(al_llegar=None):
+    concurrencia = max(1, settings.PLATZI_API_MAX_CONCURRENCY)
+    semaforo = asyncio.Semaphore(concurrencia)
+    categorias_task = asyncio.ensure_future(_acategorias_del_catalogo(semaforo))
+    try:
+        all_products = []
+        async with aclosing(_apaginas_en_orden(semaforo, concurrencia)) as paginas:
+            async for data in paginas:
+                all_products.extend(data)
+                if al_llegar is not None:
+                    al_llegar(data)
+        return all_products, await categorias_task
+    finally:
+        categorias_task.cancel()
+
+
+async def _adescargar_y_guardar(al_llegar):
+    productos, categorias = await _adescargar_catalogo(al_llegar)
+    _guardar_catalogo_descargado(productos, categorias)
+    return productos, categorias
+
+
+async def adescargar_catalogo_por_paginas():
+    """
+    Equivalente asíncrono de ``descargar_catalogo_por_paginas``: la descarga
+    es una tarea de ``_en_curso`` que sigue aunque se deje de leer.
+    """
+    cola = asyncio.Queue()
+
+    async def descargar():
+        try:
+            resultado = await _en_curso.ado('catalogo', lambda: _adescargar_y_guardar(
+                lambda data: cola.put_nowait(('pagina', data))
+            ), archivos=True)
+        except Exception as e:
+            cola.put_nowait(('error', e))
+        else:
+            cola.put_nowait(('fin', resultado))
+
+    tarea = asyncio.ensure_future(descargar())
+    try:
+        enviados = 0
+        while True:
+            tipo, valor = await cola.get()
+            if tipo == 'error':
+                raise valor
+            if tipo == 'fin':
+                for data in _paginas_restantes(valor[0], enviados):
+                    yield data
+                return
+            enviados += len(valor)
+            yield valor
+    finally:
+        # Solo se cancela la espera: ``ado`` protege la descarga con shield
+        tarea.cancel()
+
+
+async def adescargar_catalogo_con_respaldo():
+    try:
+        productos, categorias = await adescargar_catalogo()
+    except httpx.HTTPError as e:
+        productos, categorias = _respaldo_o_error(_ultimas_respuestas.get('catalogo'), e)
+        return productos, categorias, True
+    _guardar_catalogo_descargado(productos, categorias)
+    return productos, categorias, False
+
+
+async def aobtener_pagina_catalogo(filtros, page):
+    if usar_catalogo_local():
+        return await sync_to_async(obtener_pagina_catalogo)(filtros, page)
+
+    productos, categorias, obsoleto = await adescargar_catalogo_con_respaldo()
+    productos = await sync_to_async(sin_imagenes_rotas)(productos)
+    paginator = Paginator(filtrar_productos(productos, filtros), filtros['page_size'])
+    return paginator.get_page(page), categorias, obsoleto, version_de(productos, categorias)
+
+
+async def _adescargar_producto(producto_id):
+    response = await platzi_client.aget(f"products/{producto_id}")
+    response.raise_for_status()
+    return response.json()
+
+
+async def aobtener_producto(producto_id):
+    """
+    Lanza ``httpx.HTTPError`` si falla la API o ``Product.DoesNotExist`` si
+    no está en la copia local. Igual que ``obtener_producto``, si la API no
+    está disponible devuelve la última copia buena con ``stale: True``.
+    """
+    if usar_catalogo_local():
+        return await sync_to_async(obtener_producto)(producto_id)
+
+    producto = producto_en_cache(producto_id)
+    if producto is None:
+        try:
+            producto = await _en_curso.ado(f'producto:{producto_id}', lambda: _adescargar_producto(producto_id))
+        except httpx.HTTPError as e:
+            copia = _respaldo_o_error(producto_en_cache(producto_id, allow_stale=True), e)
+            return {**await sync_to_async(_sin_imagenes_rotas)(copia), 'stale': True}
+        cachear_producto(producto)
+    return await sync_to_async(_sin_imagenes_rotas)(producto)
+
+
+# ESCRITURA EN LA COPIA LOCAL
+def _datos_categoria(data):
+    return Category(
+        id=data['id'],
+        name=data.get('name', ''),
+        slug=data.get('slug') or '',
+        image=data.get('image') or '',
+        updated_at=parse_datetime(data['updatedAt']) if data.get('updatedAt') else None,
+    )
+
+
+def _datos_producto(data):
+    categoria = data.get('category') or {}
+    return Product(
+        id=data['id'],
+        title=data.get('title', ''),
+        slug=data.get('slug') or '',
+        price=data.get('price') or 0,
+        description=data.get('description') or '',
+        category_id=categoria.get('id'),
+        created_at=parse_datetime(data['creationAt']) if data.get('creationAt') else None,
+        updated_at=parse_datetime(data['updatedAt']) if data.get('updatedAt') else None,
+    )
+
+
+@transaction.atomic
+def guardar_catalogo(productos, categorias, eliminar_ausentes=False):
+    """
+    Inserta o actualiza productos, categorías e imágenes en bloque.
+    Con ``eliminar_ausentes`` borra lo que ya no existe en la API.
+    """
+    categorias_por_id = {cat['id']: cat for cat in categorias if cat.get('id') is not None}
+    for producto in productos:
+        categoria = producto.get('category') or {}
+        if categoria.get('id') is not None:
+            categorias_por_id.setdefault(categoria['id'], categoria)
+
+    Category.objects.bulk_create(
+        [_datos_categoria(cat) for cat in categorias_por_id.values()],
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=['name', 'slug', 'image', 'updated_at'],
+    )
+    Product.objects.bulk_create(
+        [_datos_producto(producto) for producto in productos],
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=['title', 'slug', 'price', 'description', 'category',
+                       'created_at', 'updated_at', 'synced_at'],
+    )
+
+    ids = [producto['id'] for producto in productos]
+    urls = {url for producto in productos for url in producto.get('images') or [] if url}
+    # Una imagen ya marcada sigue rota hasta que una comprobación la encuentre
+    # accesible, aunque la marca de este proceso haya caducado o la pusiera otro
+    rotas = imagenes.imagenes_rotas(urls) | {
+        url for url in ProductImage.objects.filter(product_id__in=ids, is_broken=True).values_list('url', flat=True)
+        if imagenes.resultado_en_cache(url) is not True
+    }
+    ProductImage.objects.filter(product_id__in=ids).delete()
+    ProductImage.objects.bulk_create([
+        ProductImage(product_id=producto['id'], url=url, position=position, is_broken=url in rotas)
+        for producto in productos
+        for position, url in enumerate(producto.get('images') or [])
+        if url
+    ])
+
+    if eliminar_ausentes:
+        Product.objects.exclude(pk__in=ids).delete()
+        Category.objects.exclude(pk__in=categorias_por_id.keys()).delete()
+
+    transaction.on_commit(invalidar_paginas)
+    return len(productos), len(categorias_por_id)
+
+
+# Las páginas del catálogo guardadas en la caché de Django llevan este número
+# en la clave; al escribir se incrementa y dejan de usarse todas a la vez.
+def generacion_paginas():
+    return cache.get_or_set('catalogo_generacion', 0, timeout=None)
+
+
+def invalidar_paginas():
+    try:
+        cache.incr('catalogo_generacion')
+    except ValueError:
+        cache.set('catalogo_generacion', 1, timeout=None)
+
+
+def registrar_producto(producto):
+    """
+    Refleja en la caché y en la copia local un producto recién creado o
+    editado en la API. Si la respuesta de la API no trae el producto completo
+    se descarta la entrada de la caché para que la próxima lectura lo pida.
+    """
+    producto_id = producto.get('id')
+    if producto_id is None:
+        return
+
+    invalidar_paginas()
+    if not _producto_completo(producto):
+        descachear_producto(producto_id)
+        if not usar_catalogo_local():
+            return
+        try:
+            producto = obtener_producto_api(producto_id)
+        except requests.exceptions.RequestException:
+            return
+
+    cachear_producto(producto)
+    if usar_catalogo_local():
+        guardar_catalogo([producto], [])
+
+
+def olvidar_producto(producto_id):
+    """
+    Refleja en la caché y en la copia local un producto eliminado en la API.
+    """
+    descachear_producto(producto_id)
+    invalidar_paginas()
+    if usar_catalogo_local():
+        Product.objects.filter(pk=producto_id).delete()
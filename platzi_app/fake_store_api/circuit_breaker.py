@@ -0,0 +1,63 @@
+"""
+Circuit breaker para las llamadas a la API de Platzi.
+
+Tras ``umbral`` fallos seguidos el circuito se abre y las llamadas se
+rechazan al instante, sin ocupar un worker esperando al timeout. Pasados
+``espera`` segundos se deja pasar una única llamada de prueba (semiabierto):
+si va bien el circuito se cierra; si falla, vuelve a abrirse.
+"""
+import threading
+import time
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+
+class CircuitBreaker:
+    def __init__(self, nombre, umbral=5, espera=30):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.espera = espera
+        self.estado = CERRADO
+        self.fallos = 0
+        self.abierto_desde = None
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Indica si la llamada puede hacerse. En estado semiabierto solo la
+        primera llamada obtiene permiso para hacer de prueba.
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO and time.monotonic() - self.abierto_desde >= self.espera:
+                self.estado = SEMIABIERTO
+                self._probando = False
+            if self.estado == SEMIABIERTO and not self._probando:
+                self._probando = True
+                return True
+            return False
+
+    def registrar_exito(self):
+        with self._lock:
+            self.estado = CERRADO
+            self.fallos = 0
+            self._probando = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.estado == SEMIABIERTO or self.fallos >= self.umbral:
+                self.estado = ABIERTO
+                self.abierto_desde = time.monotonic()
+            self._probando = False
+
+    def liberar_prueba(self):
+        """
+        Libera el permiso de prueba sin contar éxito ni fallo (llamada cancelada).
+        """
+        with self._lock:
+            self._probando = False
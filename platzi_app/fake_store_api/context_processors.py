@@ -0,0 +1,15 @@
+from . import carrito as carrito_service
+
+
+def carrito(request):
+    """
+    Número de líneas del carrito para el menú. Es un callable, así que la
+    consulta solo se hace si el template lo muestra. Un anónimo no tiene
+    carrito.
+    """
+    def lineas():
+        if not request.user.is_authenticated:
+            return 0
+        return carrito_service.contar_lineas(request.user)
+
+    return {'carrito_lineas': lineas}
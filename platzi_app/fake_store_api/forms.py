@@ -1,22 +1,21 @@
 from django import forms 
+from django.conf import settings
 import requests
+from . import catalog, imagenes
 
 class AgregarProductoForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         try:
-            response = requests.get("https://api.escuelajs.co/api/v1/categories", timeout=10)
-            if response.status_code == 200:
-                categorias = response.json()
-                valid_categories = []
-                for cat in categorias[:15]:
-                    if isinstance(cat.get('id'), int) and cat.get('name'):
-                        valid_categories.append((cat['id'], cat['name']))
-                
-                if valid_categories:
-                    self.fields['categoria'].choices = valid_categories
-                else:
-                    self.fields['categoria'].choices = self._get_default_categories()
+            # Caché compartida: con la caché caliente no hay llamada a la API
+            categorias = catalog.obtener_categorias()
+            valid_categories = []
+            for cat in categorias[:15]:
+                if isinstance(cat.get('id'), int) and cat.get('name'):
+                    valid_categories.append((cat['id'], cat['name']))
+            
+            if valid_categories:
+                self.fields['categoria'].choices = valid_categories
             else:
                 self.fields['categoria'].choices = self._get_default_categories()
         except:
@@ -115,8 +114,8 @@ class AgregarProductoForm(forms.Form):
             raise forms.ValidationError("Selecciona una categoría válida")
             
         try:
-            response = requests.get(f"https://api.escuelajs.co/api/v1/categories/{categoria_id}", timeout=5)
-            if response.status_code != 200:
+            categorias = catalog.obtener_categorias()
+            if categoria_id not in {cat.get('id') for cat in categorias}:
                 raise forms.ValidationError("La categoría seleccionada no existe")
         except requests.RequestException:
             if categoria_id not in [1, 2, 3, 4, 5]:
@@ -126,12 +125,11 @@ class AgregarProductoForm(forms.Form):
 
     def clean_imagen1(self):
         imagen = self.cleaned_data['imagen1']
-        try:
-            response = requests.head(imagen, timeout=5)
-            if response.status_code >= 400:
-                raise forms.ValidationError("La URL de la imagen no es accesible")
-        except requests.RequestException:
-            pass
+        if settings.IMAGE_CHECK_DEFERRED and imagenes.resultado_en_cache(imagen) is None:
+            # No se bloquea el envío: se comprueba después y se marca si está rota
+            imagenes.comprobar_en_segundo_plano(imagen)
+        elif not imagenes.comprobar_imagen(imagen):
+            raise forms.ValidationError("La URL de la imagen no es accesible")
         return imagen
 
     def clean(self):
@@ -144,4 +142,107 @@ class AgregarProductoForm(forms.Form):
         images = []
         if self.cleaned_data.get('imagen1'):
             images.append(self.cleaned_data['imagen1'])
-        return images
\ No newline at end of file
+        return images
+
+    def get_api_data(self):
+        """
+        Datos del formulario con los nombres de campo que espera la API.
+        """
+        return {
+            'title': self.cleaned_data['titulo'],
+            'price': self.cleaned_data['precio'],
+            'description': self.cleaned_data['descripcion'],
+            'categoryId': self.cleaned_data['categoria'],
+            'images': self.get_images_list()
+        }
+
+    @staticmethod
+    def initial_desde_producto(producto_data):
+        """
+        Valores iniciales del formulario de edición a partir de un producto de la API.
+        """
+        return {
+            'titulo': producto_data.get('title'),
+            'precio': producto_data.get('price'),
+            'descripcion': producto_data.get('description'),
+            'categoria': producto_data.get('category', {}).get('id'),
+            'imagen1': producto_data.get('images', [''])[0] if producto_data.get('images') else ''
+        }
+
+class CatalogoFiltroForm(forms.Form):
+    """
+    Parámetros GET del catálogo: búsqueda, filtros, orden y tamaño de página.
+    Los valores inválidos se ignoran en lugar de devolver un error.
+    """
+    ORDEN_CHOICES = [
+        ('', 'Relevancia'),
+        ('price', 'Precio: menor a mayor'),
+        ('-price', 'Precio: mayor a menor'),
+        ('title', 'Nombre: A-Z'),
+        ('-title', 'Nombre: Z-A'),
+    ]
+    PAGE_SIZE_CHOICES = [(12, '12'), (24, '24'), (48, '48'), (96, '96')]
+    PAGE_SIZE_DEFAULT = 24
+
+    q = forms.CharField(
+        max_length=100,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Buscar por título'}),
+        label='Buscar'
+    )
+
+    # El <select> se pinta en el template con las categorías del catálogo
+    category = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label='Categoría'
+    )
+
+    min_price = forms.FloatField(
+        required=False,
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Mín.', 'step': '0.01'}),
+        label='Precio mínimo'
+    )
+
+    max_price = forms.FloatField(
+        required=False,
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Máx.', 'step': '0.01'}),
+        label='Precio máximo'
+    )
+
+    sort = forms.ChoiceField(
+        choices=ORDEN_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Ordenar por'
+    )
+
+    page_size = forms.TypedChoiceField(
+        choices=PAGE_SIZE_CHOICES,
+        coerce=int,
+        empty_value=PAGE_SIZE_DEFAULT,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Por página'
+    )
+
+    def get_filtros(self):
+        """
+        Devuelve solo los filtros válidos, con valores por defecto para el resto.
+        """
+        self.is_valid()
+        filtros = {
+            'q': '',
+            'category': None,
+            'min_price': None,
+            'max_price': None,
+            'sort': '',
+            'page_size': self.PAGE_SIZE_DEFAULT,
+        }
+        filtros.update({
+            campo: valor for campo, valor in self.cleaned_data.items()
+            if valor not in (None, '')
+        })
+        return filtros
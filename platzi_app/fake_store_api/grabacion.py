@@ -0,0 +1,228 @@
+"""
+Grabación y reproducción del tráfico hacia la API de Platzi.
+
+Con ``PLATZI_TRANSPORT_MODE = 'record'`` cada respuesta de la API se guarda
+en ``PLATZI_CASSETTE_DIR``, un archivo JSON comprimido con gzip por petición.
+Con ``'replay'`` las respuestas salen de esos archivos sin tocar la red,
+esperando antes ``PLATZI_REPLAY_LATENCY`` segundos si se configuró. Una
+petición que no se grabó falla igual que una API caída (``ConnectionError``
+de ``requests`` o ``httpx.ConnectError``), así que las vistas muestran su
+mensaje de error habitual.
+
+Sirve para perfilar con resultados repetibles, para tests sin red y para
+usar la aplicación sin conexión. ``platzi_client`` monta ``TransporteGrabado``
+en la sesión de ``requests`` y ``TransporteGrabadoAsync`` en el cliente de
+``httpx``, de modo que cubre vistas, formularios y comprobación de imágenes.
+
+Cada petición se identifica por método, URL (con los parámetros ordenados)
+y cuerpo (normalizado si es JSON); si se graba dos veces la misma, queda la
+última respuesta.
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+GRABAR = 'record'
+REPRODUCIR = 'replay'
+
+# Cabeceras que no se guardan: dependen de la conexión o dejan de valer
+# porque el cuerpo se guarda ya descomprimido
+CABECERAS_OMITIDAS = {
+    'connection', 'content-encoding', 'content-length', 'date', 'keep-alive',
+    'set-cookie', 'transfer-encoding',
+}
+
+
+def configuracion():
+    """
+    Devuelve ``(modo, directorio, latencia)`` según los settings, o ``None``
+    si las llamadas van directamente a la red.
+    """
+    modo = settings.PLATZI_TRANSPORT_MODE
+    if not modo:
+        return None
+    if modo not in (GRABAR, REPRODUCIR):
+        raise ImproperlyConfigured(
+            f"PLATZI_TRANSPORT_MODE debe ser '', '{GRABAR}' o '{REPRODUCIR}', no {modo!r}"
+        )
+    if not settings.PLATZI_CASSETTE_DIR:
+        raise ImproperlyConfigured('PLATZI_TRANSPORT_MODE necesita PLATZI_CASSETTE_DIR')
+    return modo, str(settings.PLATZI_CASSETTE_DIR), settings.PLATZI_REPLAY_LATENCY
+
+
+# ARCHIVOS
+def _url_normalizada(url):
+    partes = urlsplit(url)
+    consulta = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((partes.scheme, partes.netloc, partes.path, consulta, ''))
+
+
+def _cuerpo_normalizado(cuerpo):
+    # requests y httpx serializan ``json=`` con distintos separadores
+    try:
+        return json.dumps(json.loads(cuerpo), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    except ValueError:
+        return cuerpo
+
+
+def ruta_grabacion(directorio, metodo, url, cuerpo=None):
+    """
+    Archivo donde se guarda la respuesta a la petición, p. ej.
+    ``get-3f2a....json.gz``.
+    """
+    resumen = hashlib.sha256()
+    resumen.update(f'{metodo.upper()} {_url_normalizada(url)}\n'.encode())
+    if cuerpo:
+        resumen.update(_cuerpo_normalizado(cuerpo))
+    return os.path.join(directorio, f'{metodo.lower()}-{resumen.hexdigest()[:24]}.json.gz')
+
+
+def guardar(directorio, metodo, url, cuerpo, estado, cabeceras, contenido):
+    cabeceras = {
+        nombre: valor for nombre, valor in cabeceras.items()
+        if nombre.lower() not in CABECERAS_OMITIDAS
+    }
+    respuesta = {'status': estado, 'headers': cabeceras}
+    try:
+        respuesta['body'] = contenido.decode('utf-8')
+    except UnicodeDecodeError:
+        respuesta['body_b64'] = base64.b64encode(contenido).decode('ascii')
+    datos = {'request': {'method': metodo.upper(), 'url': url}, 'response': respuesta}
+
+    os.makedirs(directorio, exist_ok=True)
+    ruta = ruta_grabacion(directorio, metodo, url, cuerpo)
+    # Se escribe aparte y se renombra para que otro worker nunca lea un archivo a medias
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(gzip.compress(json.dumps(datos, ensure_ascii=False).encode('utf-8')))
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def cargar(directorio, metodo, url, cuerpo=None):
+    """
+    Devuelve ``(estado, cabeceras, contenido)`` de la respuesta grabada, o
+    ``None`` si la petición no se grabó.
+    """
+    try:
+        with open(ruta_grabacion(directorio, metodo, url, cuerpo), 'rb') as archivo:
+            respuesta = json.loads(gzip.decompress(archivo.read()))['response']
+    except FileNotFoundError:
+        return None
+    if 'body_b64' in respuesta:
+        contenido = base64.b64decode(respuesta['body_b64'])
+    else:
+        contenido = respuesta['body'].encode('utf-8')
+    return respuesta['status'], respuesta['headers'], contenido
+
+
+def _cuerpo(cuerpo):
+    if isinstance(cuerpo, str):
+        return cuerpo.encode('utf-8')
+    return cuerpo or b''
+
+
+# TRANSPORTE DE REQUESTS
+class TransporteGrabado(HTTPAdapter):
+    """
+    ``HTTPAdapter`` que graba las respuestas o las reproduce desde disco.
+    """
+    def __init__(self, modo, directorio, latencia=0, **kwargs):
+        super().__init__(**kwargs)
+        self.modo = modo
+        self.directorio = directorio
+        self.latencia = latencia
+
+    def send(self, request, **kwargs):
+        cuerpo = _cuerpo(request.body)
+        if self.modo == REPRODUCIR:
+            return self._reproducir(request, cuerpo)
+
+        response = super().send(request, **kwargs)
+        guardar(self.directorio, request.method, request.url, cuerpo,
+                response.status_code, response.headers, response.content)
+        return response
+
+    def _reproducir(self, request, cuerpo):
+        grabada = cargar(self.directorio, request.method, request.url, cuerpo)
+        if grabada is None:
+            raise requests.exceptions.ConnectionError(
+                f'Sin grabación para {request.method} {request.url}', request=request
+            )
+        if self.latencia:
+            time.sleep(self.latencia)
+
+        estado, cabeceras, contenido = grabada
+        response = requests.Response()
+        response.status_code = estado
+        try:
+            response.reason = HTTPStatus(estado).phrase
+        except ValueError:
+            response.reason = ''
+        response.headers = CaseInsensitiveDict(cabeceras)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = contenido
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+# TRANSPORTE DE HTTPX
+class TransporteGrabadoAsync(httpx.AsyncBaseTransport):
+    """
+    Transporte de ``httpx.AsyncClient`` equivalente a ``TransporteGrabado``.
+    Al grabar delega en un ``AsyncHTTPTransport`` creado con ``kwargs``.
+    """
+    def __init__(self, modo, directorio, latencia=0, **kwargs):
+        self.modo = modo
+        self.directorio = directorio
+        self.latencia = latencia
+        self._red = httpx.AsyncHTTPTransport(**kwargs) if modo == GRABAR else None
+
+    async def handle_async_request(self, request):
+        cuerpo = await request.aread()
+        url = str(request.url)
+        if self.modo == REPRODUCIR:
+            grabada = cargar(self.directorio, request.method, url, cuerpo)
+            if grabada is None:
+                raise httpx.ConnectError(f'Sin grabación para {request.method} {url}', request=request)
+            if self.latencia:
+                await asyncio.sleep(self.latencia)
+            estado, cabeceras, contenido = grabada
+            return httpx.Response(estado, headers=cabeceras, content=contenido, request=request)
+
+        response = await self._red.handle_async_request(request)
+        try:
+            contenido = await response.aread()
+        finally:
+            await response.aclose()
+        guardar(self.directorio, request.method, url, cuerpo, response.status_code, response.headers, contenido)
+        # El cuerpo ya está descomprimido: sin Content-Encoding httpx no lo vuelve a decodificar
+        cabeceras = [
+            (nombre, valor) for nombre, valor in response.headers.multi_items()
+            if nombre.lower() not in CABECERAS_OMITIDAS
+        ]
+        return httpx.Response(response.status_code, headers=cabeceras, content=contenido, request=request)
+
+    async def aclose(self):
+        if self._red is not None:
+            await self._red.aclose()
@@ -0,0 +1,142 @@
+"""
+Validación de URLs de imágenes de productos.
+
+El resultado de cada comprobación se guarda en una caché del proceso (TTL
+largo para URLs accesibles, corto para las que fallan) y cada host puede
+tener su propio timeout. Con ``IMAGE_CHECK_DEFERRED`` el formulario acepta
+la URL sin esperar y la comprobación se hace en segundo plano.
+
+Una imagen rota deja de mostrarse en los dos modos del catálogo: se marca
+``is_broken`` en la copia local y, para los productos que vienen de la API,
+queda apuntada en la caché de Django (compartida entre workers si el backend
+lo es) hasta que una comprobación posterior la encuentre accesible.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import platzi_client
+from .models import ProductImage
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_resultados = TTLCache(maxsize=2000)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def timeout_para(url):
+    host = urlsplit(url).hostname or ''
+    return settings.IMAGE_CHECK_HOST_TIMEOUTS.get(host, settings.IMAGE_CHECK_TIMEOUT)
+
+
+def resultado_en_cache(url):
+    """
+    ``True`` si la URL se comprobó accesible, ``False`` si se comprobó rota
+    y ``None`` si no hay un resultado vigente.
+    """
+    return _resultados.get(url)
+
+
+def _clave_rota(url):
+    return 'imagen_rota:' + hashlib.sha1(url.encode()).hexdigest()
+
+
+def imagenes_rotas(urls):
+    """
+    Devuelve el subconjunto de ``urls`` que se comprobaron rotas, en este
+    proceso o en otro worker. Las que no tienen resultado local se consultan
+    en la caché de Django de una vez.
+    """
+    rotas = set()
+    pendientes = {}
+    for url in urls:
+        resultado = resultado_en_cache(url)
+        if resultado is False:
+            rotas.add(url)
+        elif resultado is None:
+            pendientes[_clave_rota(url)] = url
+    if pendientes:
+        rotas.update(pendientes[clave] for clave in cache.get_many(list(pendientes)))
+    return rotas
+
+
+def imagen_rota(url):
+    return url in imagenes_rotas([url])
+
+
+def _guardar_resultado(url, status_code):
+    # Sin respuesta del host la URL se da por buena, pero se vuelve a comprobar pronto
+    if status_code is None:
+        _resultados.set(url, True, ttl=settings.IMAGE_CHECK_FAIL_TTL)
+        return True
+    accesible = status_code < 400
+    ttl = settings.IMAGE_CHECK_OK_TTL if accesible else settings.IMAGE_CHECK_FAIL_TTL
+    _resultados.set(url, accesible, ttl=ttl)
+    # La marca compartida no caduca: solo la quita una comprobación que pasa
+    if accesible:
+        cache.delete(_clave_rota(url))
+    else:
+        cache.set(_clave_rota(url), True, timeout=None)
+    return accesible
+
+
+def comprobar_imagen(url):
+    """
+    Hace un HEAD a la imagen y guarda el resultado. Como antes, si el host no
+    responde la URL se da por buena.
+    """
+    resultado = resultado_en_cache(url)
+    if resultado is not None:
+        return resultado
+
+    try:
+        response = platzi_client.head(url, timeout=timeout_para(url))
+    except requests.RequestException:
+        return _guardar_resultado(url, None)
+    return _guardar_resultado(url, response.status_code)
+
+
+async def acomprobar_imagen(url):
+    """
+    Equivalente asíncrono de ``comprobar_imagen``; comparte la caché.
+    """
+    resultado = resultado_en_cache(url)
+    if resultado is not None:
+        return resultado
+
+    try:
+        response = await platzi_client.ahead(url, timeout=timeout_para(url))
+    except (httpx.HTTPError, httpx.InvalidURL):
+        return _guardar_resultado(url, None)
+    return _guardar_resultado(url, response.status_code)
+
+
+def _comprobar_y_marcar(url):
+    from . import catalog
+
+    try:
+        if not comprobar_imagen(url):
+            logger.warning('La imagen %s no es accesible', url)
+            ProductImage.objects.filter(url=url).update(is_broken=True)
+            catalog.invalidar_paginas()
+    finally:
+        connection.close()
+
+
+def comprobar_en_segundo_plano(url):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='platzi-imagenes')
+    return _executor.submit(_comprobar_y_marcar, url)
@@ -0,0 +1,31 @@
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from fake_store_api import catalog
+
+
+class Command(BaseCommand):
+    help = 'Descarga productos y categorías de la API de Platzi y los guarda en las tablas locales.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-missing',
+            action='store_true',
+            help='No borrar los productos locales que ya no existen en la API.',
+        )
+
+    def handle(self, *args, **options):
+        catalog.invalidar_categorias()
+        try:
+            productos, categorias = catalog.descargar_catalogo()
+        except requests.exceptions.RequestException as e:
+            raise CommandError(f'Error al conectar con la API: {e}')
+
+        total_productos, total_categorias = catalog.guardar_catalogo(
+            productos,
+            categorias,
+            eliminar_ausentes=not options['keep_missing'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Catálogo sincronizado: {total_productos} productos, {total_categorias} categorías.'
+        ))
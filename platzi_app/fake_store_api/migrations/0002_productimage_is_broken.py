@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fake_store_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='is_broken',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='url',
+            field=models.URLField(db_index=True, max_length=500),
+        ),
+    ]
@@ -1,3 +1,131 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Category(models.Model):
+    """
+    Copia local de una categoría de la API de Platzi.
+    El id es el mismo que usa la API.
+    """
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, blank=True)
+    image = models.URLField(max_length=500, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.name
+
+    def as_api_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'image': self.image,
+        }
+
+
+class Product(models.Model):
+    """
+    Copia local de un producto de la API de Platzi.
+    Se llena con ``python manage.py sync_catalog``.
+    """
+    id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, blank=True)
+    price = models.FloatField()
+    description = models.TextField(blank=True)
+    category = models.ForeignKey(
+        Category,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='products',
+    )
+    created_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['title'], name='product_title_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def as_api_dict(self):
+        """
+        Devuelve el producto con la misma forma que la respuesta de la API,
+        para que vistas y templates no distingan el origen de los datos.
+        Espera ``category`` en select_related e ``images`` en prefetch_related.
+        """
+        return {
+            'id': self.id,
+            'title': self.title,
+            'slug': self.slug,
+            'price': self.price,
+            'description': self.description,
+            'category': self.category.as_api_dict() if self.category else {},
+            'images': [image.url for image in self.images.all() if not image.is_broken],
+            'creationAt': self.created_at.isoformat() if self.created_at else None,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class ProductImage(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
+    url = models.URLField(max_length=500, db_index=True)
+    position = models.PositiveSmallIntegerField(default=0)
+    # Se marca cuando la comprobación en segundo plano encuentra la URL rota
+    is_broken = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['product', 'position']
+
+    def __str__(self):
+        return self.url
+
+
+class Cart(models.Model):
+    """
+    Carrito de un usuario. Sustituye al diccionario ``request.session['cart']``.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Carrito de {self.user}'
+
+
+class CartItem(models.Model):
+    """
+    Línea del carrito. ``product_id`` es el id del producto en la API y el
+    resto de campos son una copia del producto al agregarlo.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product_id = models.IntegerField()
+    title = models.CharField(max_length=255)
+    price = models.FloatField()
+    image = models.URLField(max_length=500, blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product_id'], name='cartitem_cart_product_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.title}'
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
@@ -0,0 +1,256 @@
+"""
+Cliente HTTP compartido para la API de Platzi.
+
+Mantiene una única sesión de ``requests`` por proceso con conexiones
+keep-alive, de modo que vistas y formularios reutilizan los sockets TCP/TLS
+abiertos hacia la API en lugar de pagar un handshake en cada llamada.
+
+Las vistas asíncronas usan las variantes ``aget``/``apost``/... construidas
+sobre un ``httpx.AsyncClient`` por event loop, con los mismos límites de pool.
+
+Cada endpoint de la API (método + ruta con los ids normalizados) tiene su
+propio circuit breaker: con el circuito abierto las llamadas fallan al
+instante con ``CircuitoAbierto``/``CircuitoAbiertoAsync``.
+
+Con ``PLATZI_TRANSPORT_MODE`` ambos clientes graban o reproducen el tráfico
+en lugar de ir siempre a la red (ver ``grabacion.py``).
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from . import grabacion
+from .circuit_breaker import CircuitBreaker
+
+_session = None
+_lock = threading.Lock()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitoAbierto(requests.exceptions.ConnectionError):
+    """
+    La llamada se rechazó sin hacerla porque el circuito del endpoint está abierto.
+    """
+
+
+class CircuitoAbiertoAsync(httpx.TransportError):
+    """
+    Equivalente de ``CircuitoAbierto`` para el cliente asíncrono.
+    """
+
+
+def _build_session():
+    """
+    Crea la sesión con un pool de conexiones del tamaño configurado.
+    """
+    session = requests.Session()
+    pool = {
+        'pool_connections': settings.PLATZI_API_POOL_CONNECTIONS,
+        'pool_maxsize': settings.PLATZI_API_POOL_MAXSIZE,
+    }
+    transporte = grabacion.configuracion()
+    if transporte is None:
+        adapter = HTTPAdapter(**pool)
+    else:
+        adapter = grabacion.TransporteGrabado(*transporte, **pool)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Devuelve la sesión del proceso, creándola la primera vez que se usa.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session():
+    """
+    Cierra la sesión actual; la siguiente llamada abrirá un pool nuevo.
+    """
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def _after_fork_in_child():
+    # Los sockets heredados pertenecen al proceso padre (p. ej. el master de
+    # gunicorn), así que el hijo descarta la referencia sin cerrarlos.
+    global _session, _lock
+    _session = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def build_url(path):
+    """
+    Construye la URL completa a partir de ``PLATZI_API_BASE_URL``.
+    Las URLs absolutas (p. ej. imágenes de terceros) se usan tal cual.
+    """
+    if path.startswith(('http://', 'https://')):
+        return path
+    return f"{settings.PLATZI_API_BASE_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def endpoint_de(method, path):
+    """
+    Nombre del endpoint para el circuit breaker, p. ej. ``GET products/{id}``.
+    """
+    segmentos = ['{id}' if segmento.isdigit() else segmento for segmento in path.strip('/').split('/')]
+    return f"{method} {'/'.join(segmentos)}"
+
+
+def get_breaker(method, path):
+    """
+    Devuelve el circuit breaker del endpoint, o ``None`` para URLs absolutas
+    (las imágenes de terceros no son parte de la API).
+    """
+    if path.startswith(('http://', 'https://')):
+        return None
+    nombre = endpoint_de(method, path)
+    with _breakers_lock:
+        breaker = _breakers.get(nombre)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                nombre,
+                umbral=settings.PLATZI_CIRCUIT_FAILURE_THRESHOLD,
+                espera=settings.PLATZI_CIRCUIT_RECOVERY_TIMEOUT,
+            )
+            _breakers[nombre] = breaker
+    return breaker
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _registrar_respuesta(breaker, response):
+    # Los 4xx son errores del cliente, no indican que la API esté caída
+    if response.status_code >= 500:
+        breaker.registrar_fallo()
+    else:
+        breaker.registrar_exito()
+
+
+def request(method, path, **kwargs):
+    kwargs.setdefault('timeout', settings.PLATZI_API_TIMEOUT)
+    breaker = get_breaker(method, path)
+    if breaker is None:
+        return get_session().request(method, build_url(path), **kwargs)
+
+    if not breaker.permitir():
+        raise CircuitoAbierto(f'Circuito abierto para {breaker.nombre}')
+    try:
+        response = get_session().request(method, build_url(path), **kwargs)
+    except Exception:
+        breaker.registrar_fallo()
+        raise
+    _registrar_respuesta(breaker, response)
+    return response
+
+
+def get(path, **kwargs):
+    return request('GET', path, **kwargs)
+
+
+def post(path, **kwargs):
+    return request('POST', path, **kwargs)
+
+
+def put(path, **kwargs):
+    return request('PUT', path, **kwargs)
+
+
+def delete(path, **kwargs):
+    return request('DELETE', path, **kwargs)
+
+
+def head(path, **kwargs):
+    kwargs.setdefault('allow_redirects', False)
+    return request('HEAD', path, **kwargs)
+
+
+# CLIENTE ASÍNCRONO
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Devuelve el cliente asíncrono del event loop actual. Bajo un servidor
+    ASGI hay un solo loop por proceso, así que el pool se comparte.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=settings.PLATZI_API_POOL_MAXSIZE,
+            max_keepalive_connections=settings.PLATZI_API_POOL_MAXSIZE,
+        )
+        transporte = grabacion.configuracion()
+        if transporte is None:
+            client = httpx.AsyncClient(limits=limits)
+        else:
+            client = httpx.AsyncClient(transport=grabacion.TransporteGrabadoAsync(*transporte, limits=limits))
+        _async_clients[loop] = client
+    return client
+
+
+async def arequest(method, path, **kwargs):
+    kwargs.setdefault('timeout', settings.PLATZI_API_TIMEOUT)
+    breaker = get_breaker(method, path)
+    if breaker is None:
+        return await get_async_client().request(method, build_url(path), **kwargs)
+
+    if not breaker.permitir():
+        raise CircuitoAbiertoAsync(f'Circuito abierto para {breaker.nombre}')
+    try:
+        response = await get_async_client().request(method, build_url(path), **kwargs)
+    except asyncio.CancelledError:
+        # Una página especulativa cancelada no dice nada del estado de la API
+        breaker.liberar_prueba()
+        raise
+    except Exception:
+        breaker.registrar_fallo()
+        raise
+    _registrar_respuesta(breaker, response)
+    return response
+
+
+async def aget(path, **kwargs):
+    return await arequest('GET', path, **kwargs)
+
+
+async def apost(path, **kwargs):
+    return await arequest('POST', path, **kwargs)
+
+
+async def aput(path, **kwargs):
+    return await arequest('PUT', path, **kwargs)
+
+
+async def adelete(path, **kwargs):
+    return await arequest('DELETE', path, **kwargs)
+
+
+async def ahead(path, **kwargs):
+    return await arequest('HEAD', path, **kwargs)
@@ -0,0 +1,67 @@
+from rest_framework import serializers
+
+from .models import CartItem
+
+
+class CamposSeleccionablesMixin:
+    """
+    Permite devolver solo algunos campos, p. ej. ``fields=id,title,price``.
+    """
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+class CategorySerializer(CamposSeleccionablesMixin, serializers.Serializer):
+    """
+    Categoría con la misma forma que la API de Platzi.
+    Serializa diccionarios, vengan de la API o de ``Category.as_api_dict``.
+    """
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    slug = serializers.CharField(read_only=True)
+    image = serializers.CharField(read_only=True)
+
+
+class ProductSerializer(CamposSeleccionablesMixin, serializers.Serializer):
+    """
+    Producto con la misma forma que la API de Platzi.
+    Serializa diccionarios, vengan de la API o de ``Product.as_api_dict``.
+    """
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    slug = serializers.CharField(read_only=True)
+    price = serializers.FloatField(read_only=True)
+    description = serializers.CharField(read_only=True)
+    category = CategorySerializer(read_only=True)
+    images = serializers.ListField(child=serializers.CharField(), read_only=True)
+    creationAt = serializers.CharField(read_only=True, allow_null=True)
+    updatedAt = serializers.CharField(read_only=True, allow_null=True)
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    subtotal = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = ['product_id', 'title', 'price', 'image', 'quantity', 'subtotal']
+        read_only_fields = fields
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    Un cambio del carrito: ``add`` suma ``quantity``, ``set`` la fija (0 quita
+    la línea) y ``remove`` quita la línea.
+    """
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, max_value=999, default=1)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Lote de cambios del carrito que se aplican en una sola petición.
+    """
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
@@ -0,0 +1,170 @@
+"""
+Agrupación de peticiones idénticas en curso ("single flight").
+
+Si varias peticiones piden a la vez lo mismo (p. ej. el catálogo completo con
+la caché fría), solo la primera llama a la API; las demás esperan y reciben
+el mismo resultado o el mismo error.
+
+Con ``archivos=True`` y ``SINGLE_FLIGHT_LOCK_DIR`` configurado, la agrupación
+se extiende a todos los workers de gunicorn de la máquina mediante un
+``flock`` por clave: el worker que obtiene el bloqueo hace la descarga y deja
+el resultado en un JSON que los demás leen al obtener el bloqueo. Sin
+``fcntl`` (Windows) solo se agrupa dentro de cada proceso.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Llamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class _BloqueoArchivo:
+    """
+    Bloqueo exclusivo entre procesos para una clave, con el último resultado
+    guardado junto al archivo de bloqueo.
+    """
+    def __init__(self, directorio, clave):
+        nombre = hashlib.sha1(clave.encode()).hexdigest()
+        self.ruta_lock = os.path.join(directorio, f'{nombre}.lock')
+        self.ruta_resultado = os.path.join(directorio, f'{nombre}.json')
+        self.archivo = None
+
+    def adquirir(self, desde):
+        """
+        Espera al bloqueo y devuelve ``(True, resultado)`` si otro proceso
+        terminó la misma descarga después de ``desde``; si no, ``(False, None)``.
+        """
+        self.archivo = open(self.ruta_lock, 'a')
+        fcntl.flock(self.archivo, fcntl.LOCK_EX)
+        try:
+            if os.path.getmtime(self.ruta_resultado) >= desde:
+                with open(self.ruta_resultado) as f:
+                    return True, json.load(f)
+        except (OSError, ValueError):
+            pass
+        return False, None
+
+    def guardar(self, resultado):
+        temporal = f'{self.ruta_resultado}.{os.getpid()}.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(resultado, f)
+        os.replace(temporal, self.ruta_resultado)
+
+    def liberar(self):
+        fcntl.flock(self.archivo, fcntl.LOCK_UN)
+        self.archivo.close()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._llamadas = {}
+        self._tareas = weakref.WeakKeyDictionary()
+
+    def _bloqueo_archivo(self, clave, archivos):
+        directorio = settings.SINGLE_FLIGHT_LOCK_DIR
+        if not archivos or not directorio or fcntl is None:
+            return None
+        os.makedirs(directorio, exist_ok=True)
+        return _BloqueoArchivo(directorio, clave)
+
+    def do(self, clave, funcion, archivos=False):
+        """
+        Ejecuta ``funcion()`` una sola vez para todas las llamadas concurrentes
+        con la misma ``clave`` dentro del proceso (y entre procesos con
+        ``archivos=True``).
+        """
+        with self._lock:
+            llamada = self._llamadas.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._llamadas[clave] = _Llamada()
+
+        if not lider:
+            llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = self._ejecutar(clave, funcion, archivos)
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._llamadas[clave]
+            llamada.evento.set()
+
+    def en_curso(self, clave):
+        """
+        ``True`` si ya hay una llamada con ``clave`` en curso en este proceso
+        (en el event loop actual, si lo hay).
+        """
+        with self._lock:
+            if clave in self._llamadas:
+                return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return clave in self._tareas.get(loop, {})
+
+    def _ejecutar(self, clave, funcion, archivos):
+        bloqueo = self._bloqueo_archivo(clave, archivos)
+        if bloqueo is None:
+            return funcion()
+
+        encontrado, resultado = bloqueo.adquirir(time.time())
+        try:
+            if not encontrado:
+                resultado = funcion()
+                bloqueo.guardar(resultado)
+            return resultado
+        finally:
+            bloqueo.liberar()
+
+    async def ado(self, clave, funcion, archivos=False):
+        """
+        Equivalente asíncrono de ``do``: ``funcion`` es una corrutina y las
+        llamadas concurrentes del mismo event loop esperan la misma tarea.
+        """
+        tareas = self._tareas.setdefault(asyncio.get_running_loop(), {})
+        tarea = tareas.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._aejecutar(clave, funcion, archivos))
+            tareas[clave] = tarea
+            tarea.add_done_callback(lambda _: tareas.pop(clave, None))
+        # shield: si una petición se cancela, la descarga sigue para las demás
+        return await asyncio.shield(tarea)
+
+    async def _aejecutar(self, clave, funcion, archivos):
+        bloqueo = self._bloqueo_archivo(clave, archivos)
+        if bloqueo is None:
+            return await funcion()
+
+        encontrado, resultado = await asyncio.to_thread(bloqueo.adquirir, time.time())
+        try:
+            if not encontrado:
+                resultado = await funcion()
+                bloqueo.guardar(resultado)
+            return resultado
+        finally:
+            bloqueo.liberar()
@@ -1,17 +1,112 @@
 // ... Código existente ...
 
-// Para carrito
+// Para carrito: los cambios se juntan y se envían en un solo POST a la API
+// del carrito; la página se actualiza con la respuesta sin recargar.
 document.addEventListener('DOMContentLoaded', () => {
-    const quantityForms = document.querySelectorAll('form[action*="update_cart_quantity"]');
-    quantityForms.forEach(form => {
+    const carrito = document.getElementById('carrito');
+    if (!carrito) {
+        return;
+    }
+
+    const apiUrl = carrito.dataset.cartApi;
+    const csrfToken = carrito.querySelector('[name=csrfmiddlewaretoken]').value;
+    const pendientes = new Map();
+    let temporizador = null;
+    let enviando = false;
+
+    const programarEnvio = () => {
+        clearTimeout(temporizador);
+        temporizador = setTimeout(enviar, 300);
+    };
+
+    const encolar = (productId, op, quantity) => {
+        // Por producto solo cuenta el último cambio
+        pendientes.set(productId, { op, product_id: productId, quantity });
+        programarEnvio();
+    };
+
+    const mostrarCarrito = (datos) => {
+        const lineas = new Map(datos.items.map(item => [item.product_id, item]));
+        carrito.querySelectorAll('[data-product-id]').forEach(card => {
+            const productId = Number(card.dataset.productId);
+            if (pendientes.has(productId)) {
+                return;
+            }
+            const item = lineas.get(productId);
+            if (!item) {
+                card.remove();
+                return;
+            }
+            const input = card.querySelector('.quantity-input');
+            if (document.activeElement !== input) {
+                input.value = item.quantity;
+            }
+            card.querySelector('.item-subtotal').textContent = item.subtotal;
+        });
+
+        const total = document.getElementById('carrito-total');
+        if (total) {
+            total.textContent = `Total: $${datos.total}`;
+        }
+        document.querySelectorAll('nav a[href="' + carrito.dataset.cartUrl + '"]').forEach(enlace => {
+            enlace.textContent = `Carrito (${datos.lines})`;
+        });
+        if (datos.lines === 0) {
+            carrito.querySelectorAll('.card-container, .cart-summary').forEach(el => el.remove());
+            carrito.querySelector('.empty-cart').hidden = false;
+        }
+    };
+
+    async function enviar() {
+        if (enviando || pendientes.size === 0) {
+            return;
+        }
+        enviando = true;
+        const operations = Array.from(pendientes.values());
+        pendientes.clear();
+        try {
+            const response = await fetch(apiUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': csrfToken,
+                },
+                body: JSON.stringify({ operations }),
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            mostrarCarrito(await response.json());
+        } catch (error) {
+            console.error('Error al actualizar el carrito:', error);
+        } finally {
+            enviando = false;
+            if (pendientes.size > 0) {
+                programarEnvio();
+            }
+        }
+    }
+
+    carrito.querySelectorAll('[data-product-id]').forEach(card => {
+        const productId = Number(card.dataset.productId);
+        const form = card.querySelector('.quantity-form');
+        const input = card.querySelector('.quantity-input');
+
         form.addEventListener('submit', (e) => {
             e.preventDefault();
-            const formData = new FormData(form);
-            fetch(form.action, {
-                method: 'POST',
-                body: formData,
-                headers: { 'X-CSRFToken': getCSRFToken() }
-            }).then(() => location.reload());
+            encolar(productId, 'set', Math.max(parseInt(input.value, 10) || 1, 1));
+        });
+        input.addEventListener('change', () => {
+            encolar(productId, 'set', Math.max(parseInt(input.value, 10) || 1, 1));
+        });
+
+        card.querySelector('.btn-remove').addEventListener('click', (e) => {
+            e.preventDefault();
+            if (!confirm('¿Estás seguro de que quieres remover este producto del carrito?')) {
+                return;
+            }
+            card.remove();
+            encolar(productId, 'remove', 0);
         });
     });
-});
\ No newline at end of file
+});
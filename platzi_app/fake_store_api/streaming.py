@@ -0,0 +1,208 @@
+"""
+Render incremental del catálogo (``CATALOG_STREAMING``).
+
+La página se envía en trozos: primero la cabecera (menú, mensajes, filtros)
+sin esperar a los productos; después las tarjetas a medida que llegan las
+páginas de ``/products``; al final el resumen y la paginación, que necesitan
+el total. ``GZipMiddleware`` comprime cada trozo y lo envía en cuanto está
+listo.
+
+Sin ``sort`` las tarjetas salen según llegan. Con orden hay que esperar al
+catálogo completo, pero la cabecera ya está en el navegador.
+
+Cuando la API está fallando (circuito de ``/products`` no cerrado) o ya hay
+una descarga del catálogo en curso se usa la vista normal, que sirve la
+última copia buena o espera a esa descarga y guarda la página en caché.
+"""
+from contextlib import aclosing, closing
+from itertools import chain
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.html import format_html
+
+from . import catalog, circuit_breaker, platzi_client
+
+MARCA_TARJETAS = '<!-- streaming:tarjetas -->'
+MARCA_PIE = '<!-- streaming:pie -->'
+
+
+def _numero_pagina(page):
+    try:
+        return max(int(page), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+class CatalogoIncremental:
+    """
+    Convierte las páginas de la API en trozos de HTML de ``obtener_producto.html``.
+    """
+    def __init__(self, request, filtro_form, filtros, page, categorias):
+        self.request = request
+        self.filtros = filtros
+        self.page = _numero_pagina(page)
+        self.inicio = (self.page - 1) * filtros['page_size']
+        self.fin = self.inicio + filtros['page_size']
+        self.coincidencias = 0
+        self.mostrados = 0
+        self.por_ordenar = []
+        self.plantilla_tarjetas = get_template('tarjetas_producto.html')
+        self.plantilla_pie = get_template('pie_catalogo.html')
+
+        html = render_to_string('obtener_producto.html', {
+            'success': True,
+            'en_streaming': True,
+            'categorias': categorias,
+            'filtro_form': filtro_form,
+            'filtros': filtros,
+        }, request)
+        self.cabecera, resto = html.split(MARCA_TARJETAS)
+        self.entre, self.cola = resto.split(MARCA_PIE)
+
+    def _render_tarjetas(self, productos):
+        self.mostrados += len(productos)
+        if not productos:
+            return ''
+        return self.plantilla_tarjetas.render({
+            'productos': catalog.sin_imagenes_rotas(productos),
+            'cache_tarjetas': settings.CATALOG_CARD_CACHE_TTL,
+        }, self.request)
+
+    def tarjetas(self, productos):
+        """
+        Filtra una página de la API y devuelve el HTML de las tarjetas que
+        caen en la página pedida (ninguna si hay que ordenar antes).
+        """
+        coinciden = catalog.filtrar_productos(productos, {**self.filtros, 'sort': ''})
+        if self.filtros['sort']:
+            self.por_ordenar.extend(coinciden)
+            self.coincidencias += len(coinciden)
+            return ''
+
+        desde = max(self.inicio - self.coincidencias, 0)
+        hasta = max(self.fin - self.coincidencias, 0)
+        self.coincidencias += len(coinciden)
+        return self._render_tarjetas(coinciden[desde:hasta])
+
+    def pie(self, error=None):
+        html = ''
+        if self.filtros['sort']:
+            ordenados = catalog.filtrar_productos(self.por_ordenar, self.filtros)
+            html += self._render_tarjetas(ordenados[self.inicio:self.fin])
+        html += self.entre
+        if error is not None:
+            html += format_html(
+                '<div class="alert alert-warning">No se pudo cargar el catálogo completo: {}</div>', error
+            )
+        page_obj = Paginator(range(self.coincidencias), self.filtros['page_size']).get_page(self.page)
+        html += self.plantilla_pie.render({
+            'page_obj': page_obj,
+            'mensaje': f'Mostrando {self.mostrados} de {self.coincidencias} productos',
+        }, self.request)
+        return html + self.cola
+
+
+def _trozos(catalogo, primeras, paginas):
+    yield catalogo.cabecera
+    try:
+        with closing(paginas):
+            for productos in chain(primeras, paginas):
+                html = catalogo.tarjetas(productos)
+                if html:
+                    yield html
+    except requests.exceptions.RequestException as e:
+        yield catalogo.pie(error=e)
+        return
+    yield catalogo.pie()
+
+
+async def _aencadenar(primeras, paginas):
+    for productos in primeras:
+        yield productos
+    async for productos in paginas:
+        yield productos
+
+
+async def _atrozos(catalogo, primeras, paginas):
+    yield catalogo.cabecera
+    try:
+        async with aclosing(paginas):
+            async for productos in _aencadenar(primeras, paginas):
+                html = await sync_to_async(catalogo.tarjetas)(productos)
+                if html:
+                    yield html
+    except httpx.HTTPError as e:
+        yield await sync_to_async(catalogo.pie)(error=e)
+        return
+    yield await sync_to_async(catalogo.pie)()
+
+
+def _respuesta(trozos, privada):
+    response = StreamingHttpResponse(trozos, content_type='text/html; charset=utf-8')
+    if privada:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _usar_vista_normal():
+    breaker = platzi_client.get_breaker('GET', 'products')
+    return breaker.estado != circuit_breaker.CERRADO or catalog.descarga_en_curso()
+
+
+def respuesta_streaming(request, filtro_form, filtros):
+    """
+    Devuelve la página del catálogo como ``StreamingHttpResponse``, o ``None``
+    si conviene la vista normal: API fallando, descarga ya en curso o sin
+    categorías. Con una copia buena guardada se espera a la primera página
+    antes de responder, para que una API caída no deje la página sin
+    productos y con el aviso de error.
+    """
+    if _usar_vista_normal():
+        return None
+    try:
+        categorias = catalog.obtener_categorias_api()
+    except requests.exceptions.RequestException:
+        return None
+    paginas = catalog.descargar_catalogo_por_paginas()
+    primeras = []
+    if catalog.hay_copia_del_catalogo():
+        try:
+            primeras.append(next(paginas))
+        except requests.exceptions.RequestException:
+            return None
+    catalogo = CatalogoIncremental(request, filtro_form, filtros, request.GET.get('page'), categorias)
+    return _respuesta(_trozos(catalogo, primeras, paginas), privada=request.user.is_authenticated)
+
+
+async def arespuesta_streaming(request, filtro_form, filtros):
+    """
+    Equivalente asíncrono de ``respuesta_streaming``.
+    """
+    if _usar_vista_normal():
+        return None
+    try:
+        categorias = await catalog.aobtener_categorias_api()
+    except httpx.HTTPError:
+        return None
+    paginas = catalog.adescargar_catalogo_por_paginas()
+    primeras = []
+    if catalog.hay_copia_del_catalogo():
+        try:
+            primeras.append(await anext(paginas))
+        except httpx.HTTPError:
+            return None
+    catalogo = await sync_to_async(CatalogoIncremental)(
+        request, filtro_form, filtros, request.GET.get('page'), categorias
+    )
+    # El render de la cabecera ya cargó request.user en un hilo
+    return _respuesta(_atrozos(catalogo, primeras, paginas), privada=request.user.is_authenticated)
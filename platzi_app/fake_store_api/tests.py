@@ -1,3 +1,926 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import (
+    async_views, carrito, catalog, circuit_breaker, context_processors, grabacion, imagenes, platzi_client, throttling,
+)
+from .circuit_breaker import CircuitBreaker
+from .single_flight import SingleFlight, fcntl
+from .forms import AgregarProductoForm
+from .models import ProductImage
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+def fake_platzi_get(total_productos, latencia):
+    """
+    Simula ``platzi_client.get`` con un catálogo de ``total_productos``
+    y una latencia fija por petición.
+    """
+    productos = [{'id': i, 'title': f'Producto {i}'} for i in range(1, total_productos + 1)]
+
+    def get(path, params=None, **kwargs):
+        time.sleep(latencia)
+        if path == 'categories':
+            return FakeResponse([{'id': 1, 'name': 'Clothes'}])
+        inicio = (params['page'] - 1) * params['limit']
+        return FakeResponse(productos[inicio:inicio + params['limit']])
+
+    return get
+
+
+class DescargarCatalogoTests(SimpleTestCase):
+    def setUp(self):
+        catalog.invalidar_categorias()
+
+    def descargar(self, concurrencia, total_productos=450, latencia=0.05):
+        with override_settings(PLATZI_API_MAX_CONCURRENCY=concurrencia), \
+                mock.patch.object(catalog.platzi_client, 'get', fake_platzi_get(total_productos, latencia)):
+            inicio = time.perf_counter()
+            resultado = catalog.descargar_catalogo()
+            return resultado, time.perf_counter() - inicio
+
+    def test_mantiene_el_orden_de_las_paginas(self):
+        (productos, categorias), _ = self.descargar(concurrencia=4)
+        self.assertEqual([p['id'] for p in productos], list(range(1, 451)))
+        self.assertEqual(categorias, [{'id': 1, 'name': 'Clothes'}])
+
+    def test_se_detiene_en_la_pagina_exacta(self):
+        (productos, _), _ = self.descargar(concurrencia=3, total_productos=200, latencia=0)
+        self.assertEqual(len(productos), 200)
+
+    def test_paralelo_es_mas_rapido_que_secuencial(self):
+        (secuencial, _), tiempo_secuencial = self.descargar(concurrencia=1)
+        (paralelo, _), tiempo_paralelo = self.descargar(concurrencia=6)
+        self.assertEqual(secuencial, paralelo)
+        # 5 páginas + categorías: 6 viajes en serie frente a 1 en paralelo
+        self.assertLess(tiempo_paralelo, tiempo_secuencial / 2)
+
+
+class CategoriasCacheTests(SimpleTestCase):
+    def setUp(self):
+        catalog.invalidar_categorias()
+        self.addCleanup(catalog.invalidar_categorias)
+
+    def test_formulario_reutiliza_la_cache(self):
+        get = mock.Mock(return_value=FakeResponse([{'id': 7, 'name': 'Toys'}]))
+        with mock.patch.object(catalog.platzi_client, 'get', get):
+            AgregarProductoForm()
+            form = AgregarProductoForm()
+            form.cleaned_data = {'categoria': '7'}
+            self.assertEqual(form.clean_categoria(), 7)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(form.fields['categoria'].choices, [(7, 'Toys')])
+
+    def test_sirve_copia_caducada_si_la_api_falla(self):
+        with mock.patch.object(catalog.platzi_client, 'get', return_value=FakeResponse([{'id': 7, 'name': 'Toys'}])):
+            catalog.obtener_categorias()
+        with override_settings(PLATZI_CATEGORIES_CACHE_TTL=0), \
+                mock.patch.object(catalog.platzi_client, 'get', return_value=FakeResponse([{'id': 8, 'name': 'New'}])):
+            catalog.invalidar_categorias()
+            catalog.obtener_categorias()
+        error = mock.Mock(side_effect=requests.exceptions.ConnectionError)
+        with mock.patch.object(catalog.platzi_client, 'get', error):
+            self.assertEqual(catalog.obtener_categorias(), [{'id': 8, 'name': 'New'}])
+
+
+class ImagenesTests(SimpleTestCase):
+    URL = 'https://img.example.com/foto.jpg'
+
+    def setUp(self):
+        imagenes._resultados.clear()
+        self.addCleanup(imagenes._resultados.clear)
+
+    def test_reutiliza_el_resultado_en_cache(self):
+        head = mock.Mock(return_value=FakeResponse(None, status_code=404))
+        with mock.patch.object(imagenes.platzi_client, 'head', head):
+            self.assertFalse(imagenes.comprobar_imagen(self.URL))
+            self.assertFalse(imagenes.comprobar_imagen(self.URL))
+        self.assertEqual(head.call_count, 1)
+
+    @override_settings(IMAGE_CHECK_HOST_TIMEOUTS={'img.example.com': 1.5})
+    def test_timeout_por_host(self):
+        self.assertEqual(imagenes.timeout_para(self.URL), 1.5)
+        self.assertEqual(imagenes.timeout_para('https://otro.example.com/a.jpg'), 5)
+
+    @override_settings(IMAGE_CHECK_DEFERRED=True)
+    def test_modo_diferido_no_bloquea_el_formulario(self):
+        form = AgregarProductoForm.__new__(AgregarProductoForm)
+        form.cleaned_data = {'imagen1': self.URL}
+        with mock.patch.object(imagenes, 'comprobar_en_segundo_plano') as en_segundo_plano, \
+                mock.patch.object(imagenes.platzi_client, 'head') as head:
+            self.assertEqual(form.clean_imagen1(), self.URL)
+        en_segundo_plano.assert_called_once_with(self.URL)
+        head.assert_not_called()
+
+
+class ImagenesRotasTests(TestCase):
+    URL = 'https://img.example.com/rota.jpg'
+    OTRA = 'https://img.example.com/buena.jpg'
+
+    def setUp(self):
+        imagenes._resultados.clear()
+        self.addCleanup(imagenes._resultados.clear)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_se_oculta_en_modo_api_y_en_otros_workers(self):
+        productos = [{'id': 1, 'images': [self.URL, self.OTRA]}, {'id': 2, 'images': [self.OTRA]}]
+        with mock.patch.object(imagenes.platzi_client, 'head', return_value=FakeResponse(None, status_code=404)):
+            imagenes._comprobar_y_marcar(self.URL)
+        # Otro worker no tiene el resultado en su caché del proceso
+        imagenes._resultados.clear()
+        filtrados = catalog.sin_imagenes_rotas(productos)
+        self.assertEqual(filtrados[0]['images'], [self.OTRA])
+        self.assertIs(filtrados[1], productos[1])
+        self.assertEqual(productos[0]['images'], [self.URL, self.OTRA])
+
+        imagenes._guardar_resultado(self.URL, 200)
+        imagenes._resultados.clear()
+        self.assertIs(catalog.sin_imagenes_rotas(productos), productos)
+
+    def test_resincronizar_mantiene_la_marca(self):
+        productos = [{'id': 1, 'title': 'Producto 1', 'price': 1, 'images': [self.URL]}]
+        catalog.guardar_catalogo(productos, [])
+        ProductImage.objects.update(is_broken=True)
+        cache.clear()
+
+        catalog.guardar_catalogo(productos, [])
+        self.assertTrue(ProductImage.objects.get().is_broken)
+
+        imagenes._guardar_resultado(self.URL, 200)
+        catalog.guardar_catalogo(productos, [])
+        self.assertFalse(ProductImage.objects.get().is_broken)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_abre_tras_el_umbral_y_prueba_una_vez(self):
+        breaker = CircuitBreaker('GET products', umbral=2, espera=0)
+        breaker.registrar_fallo()
+        self.assertTrue(breaker.permitir())
+        breaker.registrar_fallo()
+        self.assertEqual(breaker.estado, circuit_breaker.ABIERTO)
+        # espera=0: la siguiente llamada es la prueba y las demás se rechazan
+        self.assertTrue(breaker.permitir())
+        self.assertFalse(breaker.permitir())
+        breaker.registrar_exito()
+        self.assertEqual(breaker.estado, circuit_breaker.CERRADO)
+
+    def test_fallo_en_la_prueba_vuelve_a_abrir(self):
+        breaker = CircuitBreaker('GET products', umbral=1, espera=60)
+        breaker.registrar_fallo()
+        self.assertFalse(breaker.permitir())
+        breaker.abierto_desde -= 60
+        self.assertTrue(breaker.permitir())
+        breaker.registrar_fallo()
+        self.assertFalse(breaker.permitir())
+
+    def test_endpoint_normaliza_ids(self):
+        self.assertEqual(platzi_client.endpoint_de('GET', 'products/12'), 'GET products/{id}')
+        self.assertEqual(platzi_client.endpoint_de('POST', 'products/'), 'POST products')
+
+
+@override_settings(PLATZI_CIRCUIT_FAILURE_THRESHOLD=1, PLATZI_CIRCUIT_RECOVERY_TIMEOUT=60)
+class RespaldoObsoletoTests(SimpleTestCase):
+    def setUp(self):
+        platzi_client.reset_breakers()
+        catalog._ultimas_respuestas.clear()
+        catalog._productos_cache.clear()
+        catalog.invalidar_categorias()
+        self.addCleanup(platzi_client.reset_breakers)
+
+    def test_circuito_abierto_sirve_la_ultima_copia(self):
+        session = mock.Mock()
+        session.request.return_value = FakeResponse([{'id': 1, 'title': 'Producto 1'}])
+        with mock.patch.object(platzi_client, 'get_session', return_value=session):
+            productos, _, obsoleto = catalog.descargar_catalogo_con_respaldo()
+            self.assertFalse(obsoleto)
+
+            session.request.side_effect = requests.exceptions.ConnectTimeout
+            catalog.invalidar_categorias()
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                catalog.descargar_catalogo()
+            llamadas = session.request.call_count
+
+            # Circuito abierto: no se llama a la API y se sirve la copia guardada
+            copia, _, obsoleto = catalog.descargar_catalogo_con_respaldo()
+        self.assertTrue(obsoleto)
+        self.assertEqual(copia, productos)
+        self.assertEqual(session.request.call_count, llamadas)
+
+    def test_404_no_usa_la_copia(self):
+        catalog._productos_cache.set(5, {'id': 5}, ttl=0)
+        response = FakeResponse(None, status_code=404)
+        response.raise_for_status = mock.Mock(side_effect=requests.exceptions.HTTPError(response=response))
+        with mock.patch.object(catalog.platzi_client, 'get', return_value=response):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                catalog.obtener_producto(5)
+
+
+class ProductosCacheTests(SimpleTestCase):
+    def setUp(self):
+        catalog._productos_cache.clear()
+        self.addCleanup(catalog._productos_cache.clear)
+
+    def producto(self, producto_id, **campos):
+        return {'id': producto_id, 'title': f'Producto {producto_id}', 'price': 10,
+                'category': {'id': 1, 'name': 'Clothes'}, 'images': [], **campos}
+
+    def test_segunda_lectura_sale_de_la_cache(self):
+        get = mock.Mock(return_value=FakeResponse(self.producto(3)))
+        with mock.patch.object(catalog.platzi_client, 'get', get):
+            catalog.obtener_producto(3)
+            self.assertEqual(catalog.obtener_producto(3)['title'], 'Producto 3')
+        self.assertEqual(get.call_count, 1)
+
+    def test_escrituras_actualizan_o_descartan_la_entrada(self):
+        catalog.cachear_producto(self.producto(3))
+        catalog.registrar_producto(self.producto(3, title='Editado'))
+        self.assertEqual(catalog.producto_en_cache(3)['title'], 'Editado')
+
+        # Respuesta incompleta de la API: se descarta en lugar de guardarla
+        catalog.registrar_producto({'id': 3, 'title': 'Parcial'})
+        self.assertIsNone(catalog.producto_en_cache(3))
+
+        catalog.cachear_producto(self.producto(4))
+        catalog.olvidar_producto(4)
+        self.assertIsNone(catalog.producto_en_cache(4))
+
+    def test_lista_por_id_solo_pide_los_que_faltan(self):
+        catalog.cachear_producto(self.producto(1))
+        get = mock.Mock(side_effect=lambda path, **kwargs: FakeResponse(self.producto(int(path.split('/')[-1]))))
+        with mock.patch.object(catalog.platzi_client, 'get', get):
+            productos = catalog.obtener_productos_por_id([1, 2, 3, 2])
+        self.assertEqual(sorted(productos), [1, 2, 3])
+        self.assertEqual(get.call_count, 2)
+
+    def test_respeta_el_tamano_maximo(self):
+        cache = catalog.TTLCache(maxsize=2)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 'a')
+
+
+class SingleFlightTests(SimpleTestCase):
+    def descarga_lenta(self, llamadas, liberar):
+        def descargar():
+            llamadas.append(1)
+            liberar.wait(5)
+            return ['resultado']
+        return descargar
+
+    def test_hilos_simultaneos_comparten_una_descarga(self):
+        grupo = SingleFlight()
+        llamadas, liberar, resultados = [], threading.Event(), []
+        descargar = self.descarga_lenta(llamadas, liberar)
+
+        hilos = [threading.Thread(target=lambda: resultados.append(grupo.do('catalogo', descargar)))
+                 for _ in range(5)]
+        for hilo in hilos:
+            hilo.start()
+        time.sleep(0.1)
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, [['resultado']] * 5)
+        # Terminada la descarga, la siguiente llamada vuelve a la API
+        grupo.do('catalogo', descargar)
+        self.assertEqual(len(llamadas), 2)
+
+    def test_el_error_llega_a_todas_las_llamadas(self):
+        grupo = SingleFlight()
+
+        async def fallar():
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError('caída')
+
+        async def escenario():
+            return await asyncio.gather(*[grupo.ado('producto:1', fallar) for _ in range(3)],
+                                        return_exceptions=True)
+
+        errores = async_to_sync(escenario)()
+        self.assertEqual(len({id(e) for e in errores}), 1)
+        self.assertIsInstance(errores[0], httpx.ConnectError)
+
+    def test_corrutinas_simultaneas_comparten_una_descarga(self):
+        grupo = SingleFlight()
+        llamadas = []
+
+        async def descargar():
+            llamadas.append(1)
+            await asyncio.sleep(0.05)
+            return {'id': 1}
+
+        async def escenario():
+            return await asyncio.gather(*[grupo.ado('producto:1', descargar) for _ in range(5)])
+
+        self.assertEqual(async_to_sync(escenario)(), [{'id': 1}] * 5)
+        self.assertEqual(len(llamadas), 1)
+
+    def test_workers_comparten_el_resultado_por_archivo(self):
+        if fcntl is None:
+            self.skipTest('flock no disponible')
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        # Dos instancias simulan dos workers: no comparten memoria
+        workers = [SingleFlight(), SingleFlight()]
+        llamadas, liberar, resultados = [], threading.Event(), []
+        descargar = self.descarga_lenta(llamadas, liberar)
+
+        with override_settings(SINGLE_FLIGHT_LOCK_DIR=directorio.name):
+            hilos = [threading.Thread(target=lambda w=w: resultados.append(w.do('catalogo', descargar, archivos=True)))
+                     for w in workers]
+            for hilo in hilos:
+                hilo.start()
+                time.sleep(0.1)
+            liberar.set()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, [['resultado']] * 2)
+
+    def test_descargar_catalogo_agrupa_llamadas(self):
+        llamadas, liberar = [], threading.Event()
+
+        def descargar():
+            llamadas.append(1)
+            liberar.wait(5)
+            return [{'id': 1}], []
+
+        resultados = []
+        with mock.patch.object(catalog, '_descargar_catalogo', descargar):
+            hilos = [threading.Thread(target=lambda: resultados.append(catalog.descargar_catalogo()))
+                     for _ in range(3)]
+            for hilo in hilos:
+                hilo.start()
+            time.sleep(0.1)
+            liberar.set()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, [([{'id': 1}], [])] * 3)
+
+
+class CatalogoPaginadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        productos = [
+            {'id': i, 'title': f'Producto {i}', 'price': i * 10, 'description': 'Descripción',
+             'category': {'id': 1 if i % 2 else 2, 'name': 'Clothes' if i % 2 else 'Shoes'}, 'images': []}
+            for i in range(1, 31)
+        ]
+        categorias = [{'id': 1, 'name': 'Clothes'}, {'id': 2, 'name': 'Shoes'}]
+        patcher = mock.patch.object(catalog, 'descargar_catalogo', return_value=(productos, categorias))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_renderiza_solo_una_pagina(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), {'page_size': 12, 'page': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.context['productos']], list(range(25, 31)))
+        self.assertEqual(response.context['total_mostrados'], 30)
+
+    def test_filtra_y_ordena_antes_de_renderizar(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), {
+            'category': 2, 'min_price': 50, 'max_price': 200, 'sort': '-price', 'q': 'producto',
+        })
+        self.assertEqual([p['id'] for p in response.context['productos']], [20, 18, 16, 14, 12, 10, 8, 6])
+
+    def test_ignora_parametros_invalidos(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), {
+            'page': 'x', 'page_size': 7, 'min_price': 'abc', 'sort': 'id',
+        })
+        self.assertEqual(len(response.context['productos']), 24)
+
+    def test_responde_304_sin_renderizar_si_no_cambio(self):
+        url = reverse('fake_store_api:obtener_productos')
+        response = self.client.get(url, {'page': 2})
+        etag = response.headers['ETag']
+
+        response = self.client.get(url, {'page': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        # Otra página u otro catálogo son otra versión
+        self.assertEqual(self.client.get(url, {'page': 3}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        catalog.descargar_catalogo.return_value[0][0]['price'] = 999
+        catalog.invalidar_paginas()  # o caduca la página guardada para anónimos
+        self.assertEqual(self.client.get(url, {'page': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CacheCatalogoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.productos = [
+            {'id': i, 'title': f'Producto {i}', 'price': i, 'description': f'Descripción {i}',
+             'updatedAt': '2024-05-01T10:00:00.000Z', 'category': {'id': 1, 'name': 'Clothes'}, 'images': []}
+            for i in range(1, 4)
+        ]
+        patcher = mock.patch.object(catalog, 'descargar_catalogo', return_value=(self.productos, []))
+        self.descargar = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('fake_store_api:obtener_productos')
+
+    def test_pagina_anonima_se_reutiliza_hasta_una_escritura(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Producto 3')
+        self.assertEqual(self.descargar.call_count, 1)
+
+        catalog.registrar_producto({'id': 9, 'title': 'Parcial'})
+        self.client.get(self.url)
+        self.assertEqual(self.descargar.call_count, 2)
+
+    def test_tarjeta_se_cachea_por_id_y_updated_at(self):
+        self.client.force_login(User.objects.create_user('ana', password='secreta123'))
+        self.client.get(self.url)
+
+        self.productos[0]['description'] = 'Texto nuevo'
+        response = self.client.get(self.url)
+        self.assertEqual(self.descargar.call_count, 2)
+        self.assertContains(response, 'Descripción 1')
+        self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+
+        self.productos[0]['updatedAt'] = '2024-05-02T10:00:00.000Z'
+        self.assertContains(self.client.get(self.url), 'Texto nuevo')
+
+    @override_settings(CATALOG_PAGE_CACHE_TTL=0)
+    def test_listado_solo_se_valida_por_etag(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response.headers)
+        # Borrar un producto no cambia la fecha más reciente, pero sí la página
+        del self.productos[2]
+        fecha = 'Wed, 01 May 2024 10:00:00 GMT'
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=fecha).status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 200)
+
+
+@override_settings(CATALOG_STREAMING=True, CATALOG_PAGE_CACHE_TTL=0)
+class CatalogoStreamingTests(SimpleTestCase):
+    def setUp(self):
+        productos = [{'id': i, 'title': f'Producto {i}', 'price': i, 'images': []} for i in range(1, 251)]
+        self.descargadas = []
+        self.pagina_3_lista = threading.Event()
+        self.pagina_3_lista.set()
+
+        def descargar_pagina(page):
+            self.descargadas.append(page)
+            if page == 3:
+                self.pagina_3_lista.wait(5)
+            return productos[(page - 1) * 100:page * 100]
+
+        platzi_client.reset_breakers()
+        catalog._ultimas_respuestas.clear()
+        self.addCleanup(platzi_client.reset_breakers)
+        self.addCleanup(catalog._ultimas_respuestas.clear)
+
+        for nombre, reemplazo in [('descargar_pagina', descargar_pagina),
+                                  ('obtener_categorias_api', lambda: [{'id': 1, 'name': 'Clothes'}])]:
+            patcher = mock.patch.object(catalog, nombre, reemplazo)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_envia_la_cabecera_antes_que_los_productos(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), {'page_size': 12, 'page': 2})
+        self.assertTrue(response.streaming)
+        trozos = [trozo.decode() for trozo in response.streaming_content]
+
+        self.assertIn('id="filtrosForm"', trozos[0])
+        self.assertNotIn('product-card', trozos[0])
+        contenido = ''.join(trozos)
+        self.assertIn('#13<', contenido)
+        self.assertIn('#24<', contenido)
+        self.assertNotIn('#25<', contenido)
+        self.assertIn('Mostrando 12 de 250 productos', contenido)
+        self.assertIn('Página 2 de 21', contenido)
+
+    def test_ordenado_espera_al_catalogo_completo(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), {'page_size': 12, 'sort': '-price'})
+        contenido = b''.join(response.streaming_content).decode()
+        self.assertLess(contenido.index('#250<'), contenido.index('#239<'))
+        self.assertNotIn('#238<', contenido)
+
+    def test_comprime_el_stream(self):
+        response = self.client.get(reverse('fake_store_api:obtener_productos'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'Mostrando 24 de 250', gzip.decompress(b''.join(response.streaming_content)))
+
+    def test_api_caida_sirve_la_ultima_copia(self):
+        b''.join(self.client.get(reverse('fake_store_api:obtener_productos')).streaming_content)
+
+        with mock.patch.object(catalog, 'descargar_pagina', side_effect=requests.exceptions.ConnectionError):
+            response = self.client.get(reverse('fake_store_api:obtener_productos'))
+        self.assertFalse(response.streaming)
+        self.assertContains(response, 'Se muestra la última versión guardada')
+        self.assertContains(response, '#24<')
+        self.assertNotContains(response, 'No se pudo cargar')
+
+    def test_circuito_abierto_usa_la_vista_normal(self):
+        breaker = platzi_client.get_breaker('GET', 'products')
+        for _ in range(breaker.umbral):
+            breaker.registrar_fallo()
+        response = self.client.get(reverse('fake_store_api:obtener_productos'))
+        self.assertFalse(response.streaming)
+
+    def test_comparte_la_descarga_con_las_demas_peticiones(self):
+        self.pagina_3_lista.clear()
+        paginas = catalog.descargar_catalogo_por_paginas()
+        self.assertEqual(len(next(paginas)), 100)
+        self.assertTrue(catalog.descarga_en_curso())
+
+        # Espera a la descarga del streaming en lugar de repetirla
+        threading.Timer(0.2, self.pagina_3_lista.set).start()
+        productos, _ = catalog.descargar_catalogo()
+        self.assertEqual(len(productos), 250)
+        self.assertEqual(sum(len(data) for data in paginas), 150)
+        self.assertEqual(len(self.descargadas), len(set(self.descargadas)))
+
+
+class CarritoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ana', password='secreta123')
+        self.client.force_login(self.user)
+        patcher = mock.patch.object(catalog, 'obtener_producto', side_effect=lambda producto_id: {
+            'id': producto_id, 'title': f'Producto {producto_id}', 'price': 10.5, 'images': ['https://i.imgur.com/a.jpg'],
+        })
+        self.obtener_producto = patcher.start()
+        self.addCleanup(patcher.stop)
+        catalog._productos_cache.clear()
+        self.addCleanup(catalog._productos_cache.clear)
+
+    def test_contador_del_menu_para_anonimos(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        lineas = context_processors.carrito(request)['carrito_lineas']
+        with self.assertNumQueries(0):
+            self.assertEqual(lineas(), 0)
+
+    def test_agregar_suma_en_la_misma_linea(self):
+        for _ in range(3):
+            self.client.get(reverse('fake_store_api:add_to_cart', args=[7]))
+        self.client.get(reverse('fake_store_api:add_to_cart', args=[8]))
+
+        self.assertEqual(self.obtener_producto.call_count, 2)
+        self.assertEqual(list(carrito.lineas(self.user).values_list('product_id', 'quantity')), [(7, 3), (8, 1)])
+        self.assertEqual(carrito.totales(self.user), {'total': 42.0, 'unidades': 4, 'lineas': 2})
+
+    def test_ver_cambiar_y_quitar(self):
+        carrito.agregar_producto(self.user, {'id': 7, 'title': 'Producto 7', 'price': 10.5, 'images': []})
+        self.client.post(reverse('fake_store_api:update_cart_quantity', args=[7]), {'quantity': 4})
+
+        response = self.client.get(reverse('fake_store_api:cart'))
+        self.assertContains(response, 'Total: $42.0')
+        self.assertContains(response, 'Carrito (1)')
+
+        self.client.get(reverse('fake_store_api:remove_from_cart', args=[7]))
+        self.assertEqual(carrito.contar_lineas(self.user), 0)
+
+    def test_importa_el_carrito_antiguo_de_la_sesion(self):
+        session = self.client.session
+        session['cart'] = {'7': {'title': 'Producto 7', 'price': 2.0, 'quantity': 2, 'image': ''}}
+        session.save()
+
+        response = self.client.get(reverse('fake_store_api:cart'))
+        self.assertContains(response, 'Producto 7')
+        # Al verlo se actualiza al precio del catálogo (10.5)
+        self.assertEqual(response.context['total'], 21.0)
+        self.assertNotIn('cart', self.client.session)
+
+    def test_actualiza_los_precios_en_una_pasada(self):
+        for producto_id in range(1, 61):
+            carrito.agregar_producto(self.user, {'id': producto_id, 'title': 'P', 'price': 10.5, 'images': []})
+        carrito.lineas(self.user).filter(product_id__in=[3, 5]).update(price=1.0)
+        catalog.cachear_producto({'id': 8, 'title': 'P', 'price': 12.0, 'images': [], 'category': {}})
+
+        with self.assertNumQueries(2):  # leer las líneas y un solo UPDATE
+            anteriores = carrito.actualizar_precios(self.user)
+
+        self.assertEqual(anteriores, {3: 1.0, 5: 1.0, 8: 10.5})
+        self.assertEqual(self.obtener_producto.call_count, 59)
+        self.assertEqual(carrito.totales(self.user)['total'], 59 * 10.5 + 12.0)
+
+        response = self.client.get(reverse('fake_store_api:api_cart'))
+        self.assertEqual(response.json()['price_changes'], [])
+
+    def test_api_aplica_un_lote_de_cambios(self):
+        carrito.agregar_producto(self.user, {'id': 7, 'title': 'Producto 7', 'price': 10.5, 'images': []})
+        carrito.agregar_producto(self.user, {'id': 8, 'title': 'Producto 8', 'price': 1.0, 'images': []})
+        productos = {9: {'id': 9, 'title': 'Producto 9', 'price': 2.0, 'images': []}}
+
+        with mock.patch.object(catalog, 'obtener_productos_por_id', return_value=productos) as por_id:
+            response = self.client.post(reverse('fake_store_api:api_cart'), {'operations': [
+                {'op': 'set', 'product_id': 7, 'quantity': 2},
+                {'op': 'remove', 'product_id': 8},
+                {'op': 'add', 'product_id': 9, 'quantity': 3},
+                {'op': 'add', 'product_id': 99},
+            ]}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        por_id.assert_called_once_with([9, 99])
+        data = response.json()
+        self.assertEqual([(item['product_id'], item['quantity'], item['subtotal']) for item in data['items']],
+                         [(7, 2, 21.0), (9, 3, 6.0)])
+        self.assertEqual((data['total'], data['units'], data['lines']), (27.0, 5, 2))
+        self.assertEqual(data['errors'], [{'product_id': 99, 'error': 'Producto no encontrado'}])
+
+    def test_api_rechaza_operaciones_invalidas(self):
+        url = reverse('fake_store_api:api_cart')
+        response = self.client.post(url, {'operations': [{'op': 'vaciar', 'product_id': 7}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'operations': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class CarritoConcurrenteTests(TransactionTestCase):
+    def test_add_to_cart_en_paralelo_no_pierde_incrementos(self):
+        user = User.objects.create_user('ana', password='secreta123')
+        peticiones = 20
+
+        def obtener_producto(producto_id):
+            time.sleep(0.3)  # todas las peticiones llegan antes de que exista la línea
+            return {'id': producto_id, 'title': 'Producto', 'price': 1.0, 'images': []}
+
+        def agregar(client):
+            barrera.wait(timeout=10)
+            try:
+                return client.get(reverse('fake_store_api:add_to_cart', args=[7])).status_code
+            finally:
+                connection.close()
+
+        clientes = [Client() for _ in range(peticiones)]
+        for client in clientes:
+            client.force_login(user)
+        barrera = threading.Barrier(peticiones)
+        with mock.patch.object(catalog, 'obtener_producto', obtener_producto):
+            with ThreadPoolExecutor(max_workers=peticiones) as executor:
+                estados = list(executor.map(agregar, clientes))
+
+        self.assertEqual(estados, [302] * peticiones)
+        self.assertEqual(list(carrito.lineas(user).values_list('quantity', flat=True)), [peticiones])
+
+
+class CatalogoApiTests(TestCase):
+    def setUp(self):
+        # Precios y títulos repetidos para comprobar el desempate por id
+        self.productos = [
+            {'id': i, 'title': f'Producto {i % 4}', 'price': (i % 5) * 10, 'description': '',
+             'category': {'id': 1 if i % 2 else 2, 'name': 'Clothes' if i % 2 else 'Shoes'}, 'images': []}
+            for i in range(1, 24)
+        ]
+        self.categorias = [{'id': 1, 'name': 'Clothes'}, {'id': 2, 'name': 'Shoes'}]
+        patcher = mock.patch.object(catalog, 'descargar_catalogo', return_value=(self.productos, self.categorias))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recorrer(self, **parametros):
+        paginas = []
+        url = reverse('fake_store_api:api_products')
+        response = self.client.get(url, parametros)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(b''.join(response.streaming_content))
+            paginas.append(data['results'])
+            if not data['next']:
+                return paginas
+            response = self.client.get(data['next'])
+
+    def test_recorre_todo_el_catalogo_sin_repetir(self):
+        paginas = self.recorrer(sort='-price', limit=5, fields='id,price')
+        productos = [producto for pagina in paginas for producto in pagina]
+        esperado = sorted(self.productos, key=lambda p: (-p['price'], p['id']))
+        self.assertEqual([p['id'] for p in productos], [p['id'] for p in esperado])
+        self.assertEqual(set(productos[0]), {'id', 'price'})
+        self.assertEqual(len(paginas), 5)
+
+    @override_settings(CATALOG_SOURCE='local')
+    def test_copia_local_da_el_mismo_orden_que_la_api(self):
+        with mock.patch.object(catalog.imagenes, 'imagenes_rotas', return_value=set()):
+            catalog.guardar_catalogo(self.productos, self.categorias)
+        filtros = {'sort': '-title', 'category': 1, 'limit': 4, 'fields': 'id'}
+
+        local = [p['id'] for pagina in self.recorrer(**filtros) for p in pagina]
+        with override_settings(CATALOG_SOURCE='api'):
+            api = [p['id'] for pagina in self.recorrer(**filtros) for p in pagina]
+        self.assertEqual(local, api)
+        self.assertEqual(len(local), 12)
+
+    def test_parametros_invalidos(self):
+        url = reverse('fake_store_api:api_products')
+        self.assertEqual(self.client.get(url, {'fields': 'id,secreto'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'no-es-un-cursor'}).status_code, 400)
+        cursor_de_precio = catalog.codificar_cursor([10, 3])
+        self.assertEqual(self.client.get(url, {'sort': 'title', 'cursor': cursor_de_precio}).status_code, 400)
+
+    def test_detalle_y_categorias(self):
+        with mock.patch.object(catalog, 'obtener_categorias', return_value=self.categorias):
+            response = self.client.get(reverse('fake_store_api:api_categories'), {'fields': 'name'})
+        self.assertEqual(response.json(), [{'name': 'Clothes'}, {'name': 'Shoes'}])
+
+        with mock.patch.object(catalog, 'obtener_producto', return_value=self.productos[0]):
+            response = self.client.get(reverse('fake_store_api:api_product', args=[1]), {'fields': 'id,title'})
+        self.assertEqual(response.json(), {'id': 1, 'title': 'Producto 1'})
+
+    def test_detalle_usa_updated_at_como_version(self):
+        producto = {**self.productos[0], 'updatedAt': '2024-05-01T10:00:00.000Z'}
+        url = reverse('fake_store_api:api_product', args=[1])
+        with mock.patch.object(catalog, 'obtener_producto', return_value=producto):
+            response = self.client.get(url)
+            self.assertEqual(response.headers['Last-Modified'], 'Wed, 01 May 2024 10:00:00 GMT')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified']).status_code, 304)
+
+            producto['updatedAt'] = '2024-05-02T10:00:00.000Z'
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 200)
+
+            # Con sesión la respuesta depende del usuario: solo ETag
+            self.client.force_login(User.objects.create_user('ana', password='secreta123'))
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response.headers)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Thu, 02 May 2024 10:00:00 GMT').status_code, 200)
+
+
+class LimiteCompartidoTests(TestCase):
+    def test_dos_procesos_comparten_la_cubeta(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = f'{directorio}/throttle.sqlite3'
+            # Dos almacenes sobre el mismo archivo, como dos workers
+            worker1, worker2 = throttling.AlmacenCubetas(ruta), throttling.AlmacenCubetas(ruta)
+            permitidos = [
+                worker.consumir('anon:1.2.3.4', capacidad=4, ritmo=0.001)[0]
+                for worker in (worker1, worker2) * 3
+            ]
+            self.assertEqual(permitidos, [True] * 4 + [False] * 2)
+
+            permitido, espera = worker1.consumir('anon:1.2.3.4', capacidad=4, ritmo=0.001)
+            self.assertFalse(permitido)
+            self.assertAlmostEqual(espera, 1000, delta=5)
+            self.assertTrue(worker2.consumir('anon:5.6.7.8', capacidad=4, ritmo=0.001)[0])
+
+    def test_vistas_html_que_llaman_a_la_api(self):
+        throttling.almacen().limpiar()
+        self.addCleanup(throttling.almacen().limpiar)
+        user = User.objects.create_user('ana', password='secreta123')
+        self.client.force_login(user)
+
+        with mock.patch.dict(throttling.PlatziRateThrottle.THROTTLE_RATES, {'platzi': '2/hour'}), \
+                mock.patch.object(catalog, 'obtener_producto', side_effect=requests.exceptions.ConnectionError):
+            estados = [self.client.get(reverse('fake_store_api:add_to_cart', args=[7])).status_code for _ in range(3)]
+            response = self.client.get(reverse('fake_store_api:cart'))
+
+        self.assertEqual(estados, [302, 302, 429])
+        self.assertEqual(response.status_code, 429)
+        self.assertAlmostEqual(int(response['Retry-After']), 1800, delta=5)
+
+
+class VistasAsincronasTests(SimpleTestCase):
+    def setUp(self):
+        catalog.invalidar_categorias()
+        self.addCleanup(catalog.invalidar_categorias)
+        productos = [{'id': i, 'title': f'Producto {i}', 'price': i, 'images': []} for i in range(1, 251)]
+        self.peticiones = []
+
+        def handler(request):
+            self.peticiones.append(request.url.path)
+            if request.url.path.endswith('/categories'):
+                return httpx.Response(200, json=[{'id': 1, 'name': 'Clothes'}])
+            page = int(request.url.params['page'])
+            return httpx.Response(200, json=productos[(page - 1) * 100:page * 100])
+
+        patcher = mock.patch.object(
+            catalog.platzi_client, 'get_async_client',
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_adescargar_catalogo_mantiene_el_orden(self):
+        productos, categorias = async_to_sync(catalog.adescargar_catalogo)()
+        self.assertEqual([p['id'] for p in productos], list(range(1, 251)))
+        self.assertEqual(categorias, [{'id': 1, 'name': 'Clothes'}])
+
+    def test_obtener_productos_asincrono(self):
+        request = RequestFactory().get('/obtener_productos/', {'page_size': 12})
+        request.user = AnonymousUser()
+        response = async_to_sync(async_views.obtener_productos)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Producto 12')
+        self.assertNotContains(response, 'Producto 13<')
+
+    @override_settings(CATALOG_STREAMING=True, CATALOG_PAGE_CACHE_TTL=0)
+    def test_obtener_productos_asincrono_en_streaming(self):
+        request = RequestFactory().get('/obtener_productos/', {'page_size': 12, 'page': 9})
+        request.user = AnonymousUser()
+
+        async def leer():
+            response = await async_views.obtener_productos(request)
+            return [trozo async for trozo in response.streaming_content]
+
+        contenido = b''.join(async_to_sync(leer)()).decode()
+        self.assertIn('Producto 97<', contenido)
+        self.assertIn('Producto 108<', contenido)
+        self.assertIn('Mostrando 12 de 250 productos', contenido)
+
+
+class GrabacionTests(SimpleTestCase):
+    URL = 'https://api.example.com/api/v1/'
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        platzi_client.reset_session()
+        self.addCleanup(platzi_client.reset_session)
+        platzi_client.reset_breakers()
+        self.addCleanup(platzi_client.reset_breakers)
+
+    def modo(self, modo):
+        return override_settings(PLATZI_API_BASE_URL=self.URL, PLATZI_TRANSPORT_MODE=modo,
+                                 PLATZI_CASSETTE_DIR=self.directorio)
+
+    def test_graba_y_reproduce_sin_red(self):
+        def send(adapter, request, **kwargs):
+            response = requests.Response()
+            response.status_code = 201 if request.method == 'POST' else 200
+            response.headers['Content-Type'] = 'application/json'
+            response._content = json.dumps({'url': request.url}).encode()
+            response.request = request
+            return response
+
+        with self.modo(grabacion.GRABAR), \
+                mock.patch('requests.adapters.HTTPAdapter.send', autospec=True, side_effect=send) as red:
+            platzi_client.reset_session()
+            grabada = platzi_client.get('products', params={'page': 2, 'limit': 10}).json()
+            platzi_client.post('products/', json={'title': 'Nuevo', 'price': 5})
+        self.assertEqual(red.call_count, 2)
+
+        with self.modo(grabacion.REPRODUCIR), \
+                mock.patch('requests.adapters.HTTPAdapter.send', side_effect=AssertionError('sin red')):
+            platzi_client.reset_session()
+            # El orden de los parámetros no cambia la petición
+            response = platzi_client.get('products', params={'limit': 10, 'page': 2})
+            self.assertEqual(response.json(), grabada)
+            self.assertEqual(platzi_client.post('products/', json={'price': 5, 'title': 'Nuevo'}).status_code, 201)
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                platzi_client.get('products/99')
+
+    def test_cliente_asincrono(self):
+        def handler(request):
+            return httpx.Response(200, json={'id': 3})
+
+        async def pedir():
+            client = platzi_client.get_async_client()
+            try:
+                if client._transport._red is not None:
+                    client._transport._red = httpx.MockTransport(handler)
+                response = await platzi_client.aget('products/3')
+                return response.status_code, response.json()
+            finally:
+                await client.aclose()
+
+        with self.modo(grabacion.GRABAR):
+            self.assertEqual(async_to_sync(pedir)(), (200, {'id': 3}))
+        with self.modo(grabacion.REPRODUCIR):
+            self.assertEqual(async_to_sync(pedir)(), (200, {'id': 3}))
+            platzi_client.reset_session()
+            # Lo grabado por un cliente lo reproduce el otro
+            self.assertEqual(platzi_client.get('products/3').json(), {'id': 3})
+
+    def test_modo_desconocido(self):
+        with override_settings(PLATZI_TRANSPORT_MODE='offline'), self.assertRaises(ImproperlyConfigured):
+            grabacion.configuracion()
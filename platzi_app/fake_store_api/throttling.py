@@ -0,0 +1,210 @@
+"""
+Límite de peticiones compartido entre los workers de gunicorn.
+
+Los throttles de DRF guardan el historial en la caché de Django, que por
+defecto es memoria de cada proceso: con N workers el límite real es N veces
+el configurado, y cada petición reescribe la lista de instantes. Aquí cada
+cliente tiene una cubeta de fichas (token bucket) en un archivo SQLite que
+comparten todos los procesos de la máquina. Cada petición lee y actualiza una
+sola fila dentro de ``BEGIN IMMEDIATE``, así que dos workers no se pisan.
+
+El archivo es ``THROTTLE_DB_PATH`` (``throttle.sqlite3`` en ``BASE_DIR`` por
+defecto), sea cual sea la base de datos de la aplicación: con PostgreSQL
+también hace falta un archivo común para que el límite sea de la máquina y
+no de cada worker. Solo los tests lo cambian por ``:memory:``.
+
+Además de las clases para ``DEFAULT_THROTTLE_CLASSES``, ``limitar`` aplica el
+ámbito ``platzi`` a las vistas HTML que llaman a la API de Platzi.
+"""
+import functools
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import throttling
+
+
+class AlmacenCubetas:
+    """
+    Cubetas de fichas guardadas en SQLite, una fila por cliente y ámbito.
+    """
+    # Cada cuántas peticiones se borran las cubetas llenas (equivalen a no tener fila)
+    LIMPIAR_CADA = 1000
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.en_memoria = ruta == ':memory:'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._compartida = None
+        self._peticiones = 0
+        with self._conexion() as conexion:
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS cubetas ('
+                'clave TEXT PRIMARY KEY, fichas REAL NOT NULL, actualizado REAL NOT NULL)'
+            )
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None, check_same_thread=False)
+        if not self.en_memoria:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+        return conexion
+
+    def _conexion(self):
+        """
+        Conexión por hilo sobre el archivo; en memoria, una sola para todo el
+        proceso y usada de a un hilo por vez.
+        """
+        if self.en_memoria:
+            if self._compartida is None:
+                self._compartida = self._conectar()
+            return _Exclusiva(self._compartida, self._lock)
+        if getattr(self._local, 'conexion', None) is None:
+            self._local.conexion = self._conectar()
+        return _Exclusiva(self._local.conexion, None)
+
+    def consumir(self, clave, capacidad, ritmo):
+        """
+        Gasta una ficha de la cubeta ``clave``, que admite ``capacidad`` fichas
+        y recupera ``ritmo`` por segundo. Devuelve ``(permitido, espera)``,
+        con los segundos que faltan para la próxima ficha si no hay.
+        """
+        ahora = time.time()
+        with self._conexion() as conexion:
+            conexion.execute('BEGIN IMMEDIATE')
+            try:
+                fila = conexion.execute(
+                    'SELECT fichas, actualizado FROM cubetas WHERE clave = ?', (clave,)
+                ).fetchone()
+                fichas = capacidad if fila is None else min(capacidad, fila[0] + (ahora - fila[1]) * ritmo)
+                permitido = fichas >= 1
+                if permitido:
+                    fichas -= 1
+                conexion.execute(
+                    'INSERT INTO cubetas (clave, fichas, actualizado) VALUES (?, ?, ?) '
+                    'ON CONFLICT (clave) DO UPDATE SET fichas = excluded.fichas, actualizado = excluded.actualizado',
+                    (clave, fichas, ahora)
+                )
+                conexion.execute('COMMIT')
+            except BaseException:
+                conexion.execute('ROLLBACK')
+                raise
+
+            self._peticiones += 1
+            if self._peticiones % self.LIMPIAR_CADA == 0:
+                # Una cubeta sin uso durante más de un día ya está llena
+                conexion.execute('DELETE FROM cubetas WHERE actualizado < ?', (ahora - 86400,))
+
+        return permitido, 0 if permitido else (1 - fichas) / ritmo
+
+    def limpiar(self):
+        with self._conexion() as conexion:
+            conexion.execute('DELETE FROM cubetas')
+
+
+class _Exclusiva:
+    def __init__(self, conexion, lock):
+        self.conexion = conexion
+        self.lock = lock
+
+    def __enter__(self):
+        if self.lock is not None:
+            self.lock.acquire()
+        return self.conexion
+
+    def __exit__(self, *exc):
+        if self.lock is not None:
+            self.lock.release()
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+def almacen():
+    ruta = str(settings.THROTTLE_DB_PATH)
+    with _almacenes_lock:
+        if ruta not in _almacenes:
+            _almacenes[ruta] = AlmacenCubetas(ruta)
+        return _almacenes[ruta]
+
+
+# THROTTLES DE DRF
+class CubetaCompartidaMixin:
+    """
+    Sustituye el historial en caché de ``SimpleRateThrottle`` por una cubeta
+    de fichas compartida: ``num_requests`` de ráfaga que se recuperan a lo
+    largo de ``duration`` segundos.
+    """
+    espera = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        permitido, self.espera = almacen().consumir(self.key, self.num_requests, self.num_requests / self.duration)
+        return permitido
+
+    def wait(self):
+        return self.espera
+
+
+class SharedAnonRateThrottle(CubetaCompartidaMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(CubetaCompartidaMixin, throttling.UserRateThrottle):
+    pass
+
+
+class PlatziRateThrottle(SharedUserRateThrottle):
+    """
+    Peticiones que llegan a la API de Platzi, por usuario o por IP.
+    """
+    scope = 'platzi'
+
+
+# VISTAS HTML
+def _demasiadas(espera):
+    segundos = max(1, round(espera))
+    response = HttpResponse(
+        f'Demasiadas solicitudes. Intenta de nuevo en {segundos} segundos.',
+        status=429, content_type='text/plain; charset=utf-8'
+    )
+    response['Retry-After'] = str(segundos)
+    return response
+
+
+def limitar(vista):
+    """
+    Aplica ``PlatziRateThrottle`` a una vista de Django, síncrona o asíncrona.
+    Si se supera el límite responde 429 con ``Retry-After``.
+    """
+    def permitir(request):
+        throttle = PlatziRateThrottle()
+        if throttle.allow_request(request, None):
+            return None
+        return _demasiadas(throttle.wait())
+
+    if iscoroutinefunction(vista):
+        @functools.wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            rechazo = await sync_to_async(permitir)(request)
+            if rechazo is not None:
+                return rechazo
+            return await vista(request, *args, **kwargs)
+        return envoltura_async
+
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        rechazo = permitir(request)
+        if rechazo is not None:
+            return rechazo
+        return vista(request, *args, **kwargs)
+    return envoltura
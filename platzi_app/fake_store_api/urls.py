@@ -1,25 +1,35 @@
 # fake_store_api/urls.py - RUTAS CORRECTAS
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'fake_store_api'
 
+# Con PLATZI_ASYNC_VIEWS las vistas que llaman a la API usan su versión asíncrona
+api_views = async_views if settings.PLATZI_ASYNC_VIEWS else views
+
 urlpatterns = [
     # VISTAS PÚBLICAS
     path('', views.inicio, name='inicio'),
-    path('obtener_productos/', views.obtener_productos, name='obtener_productos'),
+    path('obtener_productos/', api_views.obtener_productos, name='obtener_productos'),
     
     # VISTAS PROTEGIDAS (requieren login)
-    path('agregar_producto/', views.agregar_producto, name='agregar_producto'),
-    path('agregar_producto_api/', views.agregar_producto_api, name='agregar_producto_api'),
-    path('editar_producto/', views.editar_producto, name='editar_producto'),
-    path('editar_producto/<int:producto_id>/', views.editar_producto, name='editar_producto_con_id'),
-    path('editar_producto_api/', views.editar_producto_api, name='editar_producto_api'),
-    path('eliminar_producto/<int:producto_id>/', views.eliminar_producto, name='eliminar_producto'),
+    path('agregar_producto/', api_views.agregar_producto, name='agregar_producto'),
+    path('agregar_producto_api/', api_views.agregar_producto_api, name='agregar_producto_api'),
+    path('editar_producto/', api_views.editar_producto, name='editar_producto'),
+    path('editar_producto/<int:producto_id>/', api_views.editar_producto, name='editar_producto_con_id'),
+    path('editar_producto_api/', api_views.editar_producto_api, name='editar_producto_api'),
+    path('eliminar_producto/<int:producto_id>/', api_views.eliminar_producto, name='eliminar_producto'),
     
     # ✅ CARRITO PROTEGIDO (aquí es donde deben estar)
     path('cart/', views.view_cart, name='cart'),
-    path('add_to_cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
+    path('add_to_cart/<int:product_id>/', api_views.add_to_cart, name='add_to_cart'),
     path('remove_from_cart/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('update_cart_quantity/<int:product_id>/', views.update_cart_quantity, name='update_cart_quantity'),
+
+    # API JSON DEL CATÁLOGO
+    path('api/products/', views.productos_api, name='api_products'),
+    path('api/products/<int:producto_id>/', views.producto_api, name='api_product'),
+    path('api/categories/', views.categorias_api, name='api_categories'),
+    path('api/cart/', views.carrito_api, name='api_cart'),
 ]
\ No newline at end of file
@@ -1,51 +1,144 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+import hashlib
 import requests
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 import json
-from .forms import AgregarProductoForm
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from . import carrito, catalog, platzi_client, streaming
+from .forms import AgregarProductoForm, CatalogoFiltroForm
+from .models import Product
+from .serializers import CartBatchSerializer, CartItemSerializer, CategorySerializer, ProductSerializer
+from .throttling import limitar
 
 # VISTAS PÚBLICAS (accesibles sin login)
 def inicio(request):
     return render(request, 'inicio.html')
 
+def contexto_catalogo(page_obj, categories, filtro_form, filtros, obsoleto=False):
+    total = page_obj.paginator.count
+    return {
+        'success': True,
+        'obsoleto': obsoleto,
+        'total_mostrados': total,
+        'consulta': 'Todos los productos',
+        'mensaje': f'Mostrando {len(page_obj.object_list)} de {total} productos',
+        'productos': page_obj.object_list,
+        'page_obj': page_obj,
+        'categorias': categories,
+        'filtro_form': filtro_form,
+        'filtros': filtros,
+        'cache_tarjetas': settings.CATALOG_CARD_CACHE_TTL,
+    }
+
+# RESPUESTAS CONDICIONALES (ETag / Last-Modified)
+def etag_para(request, version, *variante):
+    """
+    ETag de una página HTML: la versión de los datos más lo que cambia el
+    HTML para el mismo dato (parámetros GET, usuario, token CSRF).
+    """
+    huella = hashlib.sha1(repr((
+        version[0],
+        request.GET.urlencode(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        variante,
+    )).encode()).hexdigest()
+    return f'W/"{huella}"'
+
+def poner_validadores(response, etag, ultima_modificacion, privada=False):
+    response.headers['ETag'] = etag
+    # La fecha no distingue usuarios ni la versión anónima de la de una sesión
+    if ultima_modificacion is not None and not privada:
+        response.headers['Last-Modified'] = http_date(ultima_modificacion.timestamp())
+    # El navegador o la CDN guardan la página pero preguntan siempre si cambió
+    if privada:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+def respuesta_no_modificada(request, etag, ultima_modificacion):
+    """
+    Devuelve un 304 si el cliente ya tiene esta versión, antes de renderizar.
+    Con mensajes pendientes se renderiza siempre para no perderlos. Las
+    páginas con sesión solo se validan por ETag.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    privada = request.user.is_authenticated
+    marca = None
+    if ultima_modificacion is not None and not privada:
+        marca = int(ultima_modificacion.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=marca)
+    if response is not None:
+        poner_validadores(response, etag, ultima_modificacion, privada=privada)
+    return response
+
+# PÁGINA COMPLETA EN CACHÉ PARA ANÓNIMOS
+def _clave_pagina(request):
+    if settings.CATALOG_PAGE_CACHE_TTL <= 0 or request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    parametros = hashlib.sha1(request.GET.urlencode().encode()).hexdigest()
+    return f'catalogo_pagina:{catalog.generacion_paginas()}:{parametros}'
+
+def pagina_en_cache(request):
+    """
+    Devuelve la página del catálogo ya renderizada para un anónimo (o un 304),
+    sin llamar a la API, o ``None`` si no está en la caché.
+    """
+    clave = _clave_pagina(request)
+    guardada = cache.get(clave) if clave else None
+    if guardada is None:
+        return None
+    contenido, etag, ultima_modificacion = guardada
+    no_modificada = respuesta_no_modificada(request, etag, ultima_modificacion)
+    if no_modificada is not None:
+        return no_modificada
+    return poner_validadores(HttpResponse(contenido), etag, ultima_modificacion)
+
+def guardar_pagina(request, response, ultima_modificacion):
+    clave = _clave_pagina(request)
+    if clave:
+        cache.set(clave, (response.content, response.headers['ETag'], ultima_modificacion), settings.CATALOG_PAGE_CACHE_TTL)
+
+@limitar
 def obtener_productos(request):
     if request.method == 'GET':
+        en_cache = pagina_en_cache(request)
+        if en_cache is not None:
+            return en_cache
         try:
-            consulta_productos = request.GET.get('obtener_productos', 'todos')
-            url = "https://api.escuelajs.co/api/v1"
-            
-            all_products = []
-            page = 1
-            while True:
-                response = requests.get(f"{url}/products", params={'page': page, 'limit': 100}, timeout=20)
-                response.raise_for_status()
-                data = response.json()
-                all_products.extend(data)
-                if len(data) < 100:
-                    break
-                page += 1
-            
-            categories_response = requests.get(f"{url}/categories", timeout=20)
-            categories = categories_response.json() if categories_response.status_code == 200 else []
-            
-            resultado = {
-                'data': all_products,
-                'total': len(all_products),
-                'categories': categories
-            }
-            
-            contexto = {
-                'success': True,
-                'total_mostrados': resultado['total'],
-                'consulta': 'Todos los productos',
-                'mensaje': f'Mostrando {resultado["total"]} productos',
-                'productos': resultado['data'],
-                'categorias': resultado['categories'],
-            }
-            
-            return render(request, 'obtener_producto.html', contexto)
+            filtro_form = CatalogoFiltroForm(request.GET)
+            filtros = filtro_form.get_filtros()
+            if settings.CATALOG_STREAMING and not catalog.usar_catalogo_local():
+                response = streaming.respuesta_streaming(request, filtro_form, filtros)
+                if response is not None:
+                    return response
+
+            page_obj, categories, obsoleto, version = catalog.obtener_pagina_catalogo(filtros, request.GET.get('page'))
+            # Solo ETag: la fecha más reciente no cambia al borrar un producto
+            etag = etag_para(request, version, obsoleto)
+            no_modificada = respuesta_no_modificada(request, etag, None)
+            if no_modificada is not None:
+                return no_modificada
+
+            contexto = contexto_catalogo(page_obj, categories, filtro_form, filtros, obsoleto)
+            response = render(request, 'obtener_producto.html', contexto)
+            poner_validadores(response, etag, None, privada=request.user.is_authenticated)
+            if not obsoleto:
+                guardar_pagina(request, response, None)
+            return response
 
         except requests.exceptions.RequestException as e:
             contexto = {
@@ -58,28 +151,23 @@ def obtener_productos(request):
 
 # VISTAS PROTEGIDAS (requieren login)
 @login_required
+@limitar
 def agregar_producto(request):
     form = AgregarProductoForm()
     contexto = {'form': form}
     return render(request, 'agregar_producto.html', contexto)
 
 @login_required
+@limitar
 def agregar_producto_api(request):
     if request.method == 'POST':
         form = AgregarProductoForm(request.POST)
         if form.is_valid():
             try:
-                data = {
-                    'title': form.cleaned_data['titulo'],
-                    'price': form.cleaned_data['precio'],
-                    'description': form.cleaned_data['descripcion'],
-                    'categoryId': form.cleaned_data['categoria'],
-                    'images': form.get_images_list()
-                }
-                
-                response = requests.post("https://api.escuelajs.co/api/v1/products/", json=data, timeout=20)
+                response = platzi_client.post("products/", json=form.get_api_data())
                 response.raise_for_status()
                 producto = response.json()
+                catalog.registrar_producto(producto)
                 
                 messages.success(request, '¡Producto agregado exitosamente!')
                 return redirect('fake_store_api:obtener_productos')
@@ -94,25 +182,27 @@ def agregar_producto_api(request):
     return render(request, 'agregar_producto.html', contexto)
 
 @login_required
+@limitar
 def editar_producto(request, producto_id=None):
     if producto_id is None:
         return redirect('fake_store_api:obtener_productos')
     
     try:
-        response = requests.get(f"https://api.escuelajs.co/api/v1/products/{producto_id}", timeout=20)
-        response.raise_for_status()
-        producto_data = response.json()
-    except requests.exceptions.RequestException:
+        producto_data = catalog.obtener_producto(producto_id)
+    except (requests.exceptions.RequestException, Product.DoesNotExist):
         messages.error(request, 'Error al obtener el producto.')
         return redirect('fake_store_api:obtener_productos')
     
-    form = AgregarProductoForm(initial={
-        'titulo': producto_data.get('title'),
-        'precio': producto_data.get('price'),
-        'descripcion': producto_data.get('description'),
-        'categoria': producto_data.get('category', {}).get('id'),
-        'imagen1': producto_data.get('images', [''])[0] if producto_data.get('images') else ''
-    })
+    if producto_data.get('stale'):
+        messages.warning(request, 'La API no está disponible: se muestran los últimos datos guardados del producto.')
+    
+    version = catalog.version_de([producto_data])
+    etag = etag_para(request, version, 'editar_producto')
+    no_modificada = respuesta_no_modificada(request, etag, version[1])
+    if no_modificada is not None:
+        return no_modificada
+    
+    form = AgregarProductoForm(initial=AgregarProductoForm.initial_desde_producto(producto_data))
     
     contexto = {
         'form': form,
@@ -120,9 +210,11 @@ def editar_producto(request, producto_id=None):
         'producto_data': producto_data,
         'es_edicion': True
     }
-    return render(request, 'editar_producto.html', contexto)
+    response = render(request, 'editar_producto.html', contexto)
+    return poner_validadores(response, etag, version[1], privada=True)
 
 @login_required
+@limitar
 def editar_producto_api(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Solo POST'}, status=405)
@@ -135,16 +227,9 @@ def editar_producto_api(request):
     form = AgregarProductoForm(request.POST)
     if form.is_valid():
         try:
-            data = {
-                'title': form.cleaned_data['titulo'],
-                'price': form.cleaned_data['precio'],
-                'description': form.cleaned_data['descripcion'],
-                'categoryId': form.cleaned_data['categoria'],
-                'images': form.get_images_list()
-            }
-            
-            response = requests.put(f"https://api.escuelajs.co/api/v1/products/{producto_id}", json=data, timeout=20)
+            response = platzi_client.put(f"products/{producto_id}", json=form.get_api_data())
             response.raise_for_status()
+            catalog.registrar_producto(response.json())
             
             messages.success(request, '¡Producto actualizado exitosamente!')
             return redirect('fake_store_api:obtener_productos')
@@ -163,6 +248,7 @@ def editar_producto_api(request):
     return render(request, 'editar_producto.html', contexto)
 
 @login_required
+@limitar
 def eliminar_producto(request, producto_id=None):
     if request.method != 'POST':
         return JsonResponse({'error': 'Solo se permiten solicitudes POST'}, status=405)
@@ -178,9 +264,10 @@ def eliminar_producto(request, producto_id=None):
         return JsonResponse({'error': 'ID del producto requerido'}, status=400)
 
     try:
-        response = requests.delete(f"https://api.escuelajs.co/api/v1/products/{producto_id}", timeout=20)
+        response = platzi_client.delete(f"products/{producto_id}")
         
         if response.status_code == 200:
+            catalog.olvidar_producto(producto_id)
             return JsonResponse({'success': True, 'message': '¡Producto eliminado exitosamente!'}, status=200)
         elif response.status_code == 404:
             return JsonResponse({'error': 'Producto no encontrado'}, status=404)
@@ -191,43 +278,39 @@ def eliminar_producto(request, producto_id=None):
 
 # VISTAS DE CARRITO PROTEGIDAS
 @login_required
+@limitar
 def add_to_cart(request, product_id):
-    cart = request.session.get('cart', {})
-    
-    if str(product_id) not in cart:
+    carrito.importar_de_sesion(request)
+    if not carrito.incrementar(request.user, product_id):
         try:
-            response = requests.get(f"https://api.escuelajs.co/api/v1/products/{product_id}")
-            response.raise_for_status()
-            product = response.json()
-            cart[str(product_id)] = {
-                'title': product['title'],
-                'price': product['price'],
-                'quantity': 1,
-                'image': product['images'][0] if product['images'] else ''
-            }
-        except requests.exceptions.RequestException:
+            product = catalog.obtener_producto(product_id)
+        except (requests.exceptions.RequestException, Product.DoesNotExist):
             messages.error(request, 'Error al obtener el producto.')
             return redirect('fake_store_api:obtener_productos')
-    else:
-        cart[str(product_id)]['quantity'] += 1
+        carrito.agregar_producto(request.user, product)
     
-    request.session['cart'] = cart
     messages.success(request, 'Producto agregado al carrito.')
     return redirect('fake_store_api:obtener_productos')
 
 @login_required
+@limitar
 def view_cart(request):
-    cart = request.session.get('cart', {})
-    total = sum(item['price'] * item['quantity'] for item in cart.values())
-    contexto = {'cart': cart, 'total': total}
+    carrito.importar_de_sesion(request)
+    precios_anteriores = carrito.actualizar_precios(request.user)
+    if precios_anteriores:
+        messages.info(request, f'Cambió el precio de {len(precios_anteriores)} producto(s) del carrito.')
+    items = list(carrito.lineas(request.user))
+    for item in items:
+        item.precio_anterior = precios_anteriores.get(item.product_id)
+    contexto = {
+        'items': items,
+        **carrito.totales(request.user),
+    }
     return render(request, 'cart.html', contexto)
 
 @login_required
 def remove_from_cart(request, product_id):
-    cart = request.session.get('cart', {})
-    if str(product_id) in cart:
-        del cart[str(product_id)]
-    request.session['cart'] = cart
+    carrito.quitar(request.user, product_id)
     messages.success(request, 'Producto removido del carrito.')
     return redirect('fake_store_api:cart')
 
@@ -235,8 +318,158 @@ def remove_from_cart(request, product_id):
 def update_cart_quantity(request, product_id):
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
-        cart = request.session.get('cart', {})
-        if str(product_id) in cart and quantity > 0:
-            cart[str(product_id)]['quantity'] = quantity
-        request.session['cart'] = cart
-    return redirect('fake_store_api:cart')
\ No newline at end of file
+        if quantity > 0:
+            carrito.cambiar_cantidad(request.user, product_id, quantity)
+    return redirect('fake_store_api:cart')
+
+# API JSON DEL CATÁLOGO
+def _campos_pedidos(request, serializer_class):
+    """
+    Lee ``fields=id,title,price``. Devuelve ``(campos, error)``.
+    """
+    campos = [campo.strip() for campo in request.query_params.get('fields', '').split(',') if campo.strip()]
+    desconocidos = sorted(set(campos) - set(serializer_class().fields))
+    if desconocidos:
+        return None, f"Campos desconocidos: {', '.join(desconocidos)}"
+    return campos, None
+
+def _limite_pedido(request):
+    try:
+        limite = int(request.query_params.get('limit', api_settings.PAGE_SIZE))
+    except ValueError:
+        limite = api_settings.PAGE_SIZE
+    return min(max(limite, 1), catalog.PAGE_LIMIT)
+
+def _url_siguiente(request, cursor):
+    parametros = request.GET.copy()
+    parametros['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{parametros.urlencode()}')
+
+def _json_productos(request, productos, serializer, limite, obsoleto):
+    """
+    Genera el JSON de la lista producto a producto, sin armarla entera en
+    memoria. ``next`` va al final porque solo se conoce al acabar la página.
+    """
+    yield '{"results": ['
+    ultima = None
+    entregados = 0
+    for i, (producto, posicion) in enumerate(productos):
+        yield (', ' if i else '') + json.dumps(serializer.to_representation(producto))
+        ultima = posicion
+        entregados = i + 1
+    siguiente = None
+    if entregados == limite:
+        siguiente = _url_siguiente(request, catalog.codificar_cursor(ultima))
+    yield f'], "next": {json.dumps(siguiente)}, "stale": {json.dumps(obsoleto)}}}'
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def productos_api(request):
+    """
+    Lista de productos paginada por cursor. Acepta los mismos filtros que el
+    catálogo HTML (q, category, min_price, max_price, sort) más ``limit``,
+    ``cursor`` y ``fields``.
+    """
+    campos, error = _campos_pedidos(request, ProductSerializer)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    filtros = CatalogoFiltroForm(request.query_params).get_filtros()
+    limite = _limite_pedido(request)
+    despues = None
+    if request.query_params.get('cursor'):
+        try:
+            despues = catalog.leer_cursor(request.query_params['cursor'], filtros['sort'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        productos, obsoleto = catalog.recorrer_productos(filtros, despues, limite)
+    except requests.exceptions.RequestException as e:
+        return Response({'error': f'Error al conectar con la API: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    serializer = ProductSerializer(campos=campos)
+    return StreamingHttpResponse(
+        _json_productos(request, productos, serializer, limite, obsoleto),
+        content_type='application/json'
+    )
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def producto_api(request, producto_id):
+    campos, error = _campos_pedidos(request, ProductSerializer)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        producto = catalog.obtener_producto(producto_id)
+    except Product.DoesNotExist:
+        return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code < 500:
+            return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'error': f'Error al conectar con la API: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except requests.exceptions.RequestException as e:
+        return Response({'error': f'Error al conectar con la API: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    version = catalog.version_de([producto])
+    etag = etag_para(request, version, 'api', producto.get('stale'))
+    no_modificada = respuesta_no_modificada(request, etag, version[1])
+    if no_modificada is not None:
+        return no_modificada
+
+    data = ProductSerializer(producto, campos=campos).data
+    if producto.get('stale'):
+        data['stale'] = True
+    return poner_validadores(Response(data), etag, version[1], privada=request.user.is_authenticated)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def categorias_api(request):
+    campos, error = _campos_pedidos(request, CategorySerializer)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        categorias = catalog.obtener_categorias()
+    except requests.exceptions.RequestException as e:
+        return Response({'error': f'Error al conectar con la API: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(CategorySerializer(categorias, many=True, campos=campos).data)
+
+# API JSON DEL CARRITO
+def _estado_carrito(user, no_encontrados=(), precios_anteriores=None):
+    totales = carrito.totales(user)
+    return {
+        'items': CartItemSerializer(carrito.lineas(user), many=True).data,
+        'total': totales['total'],
+        'units': totales['unidades'],
+        'lines': totales['lineas'],
+        'errors': [
+            {'product_id': product_id, 'error': 'Producto no encontrado'} for product_id in no_encontrados
+        ],
+        'price_changes': [
+            {'product_id': product_id, 'old_price': precio} for product_id, precio in (precios_anteriores or {}).items()
+        ],
+    }
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def carrito_api(request):
+    """
+    GET devuelve las líneas y los totales del carrito con los precios
+    actuales del catálogo (``price_changes`` indica los que cambiaron). POST aplica un lote de
+    cambios en una sola petición y devuelve el carrito actualizado::
+
+        {"operations": [{"op": "set", "product_id": 4, "quantity": 2},
+                        {"op": "remove", "product_id": 7}]}
+    """
+    carrito.importar_de_sesion(request)
+    if request.method == 'GET':
+        precios_anteriores = carrito.actualizar_precios(request.user)
+        return Response(_estado_carrito(request.user, precios_anteriores=precios_anteriores))
+
+    serializer = CartBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    no_encontrados = carrito.aplicar_operaciones(request.user, serializer.validated_data['operations'])
+    return Response(_estado_carrito(request.user, no_encontrados))
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 from decouple import config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +27,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # ← Agregar WhiteNoise aquí
+    # Comprime también respuestas en streaming, trozo a trozo (CATALOG_STREAMING)
+    "django.middleware.gzip.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -47,6 +50,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "fake_store_api.context_processors.carrito",
             ],
         },
     },
@@ -54,6 +58,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "platzi_store_app.wsgi.application"
 
+TEST_RUNNER = 'platzi_store_app.test_runner.PlatziTestRunner'
+
 DATABASES = {
     'default': {
         'ENGINE': config('DB_ENGINE', default='django.db.backends.sqlite3'),
@@ -65,6 +71,21 @@ DATABASES = {
     }
 }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Con varias peticiones escribiendo a la vez, una transacción que empieza
+    # leyendo y luego escribe falla al instante con "database is locked".
+    # BEGIN IMMEDIATE toma el bloqueo de escritura al empezar y espera hasta
+    # ``timeout`` segundos a que se libere.
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 20,
+    }
+    # Los tests usan un archivo: la base en memoria compartida entre hilos
+    # no respeta ``timeout`` y falla con "table is locked" en vez de esperar.
+    DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(tempfile.gettempdir(), f'platzi_test_{os.getpid()}.sqlite3'),
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -81,6 +102,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Login con usuario o email: una consulta y un solo cálculo de hash.
+# Sustituye a ModelBackend (lo extiende), así un login fallido no se
+# comprueba dos veces.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailOrUsernameBackend',
+]
+# Segundos que cada worker reutiliza su filtro de nombres de usuario ocupados
+# antes de reconstruirlo con los registrados en otros workers
+USERNAME_FILTER_TTL = config('USERNAME_FILTER_TTL', default=300, cast=int)
+# Segundos que se reutiliza la búsqueda token → usuario de la API
+# (accounts/authentication.py); se invalida antes al cerrar sesión, desactivar
+# al usuario o cambiar su contraseña
+TOKEN_AUTH_CACHE_TTL = config('TOKEN_AUTH_CACHE_TTL', default=60, cast=int)
+
 LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "UTC"
@@ -108,11 +143,76 @@ if DEBUG:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-PLATZI_API_BASE_URL = 'https://api.escuelajs.co/api/v1/'
+PLATZI_API_BASE_URL = config('PLATZI_API_BASE_URL', default='https://api.escuelajs.co/api/v1/')
+
+# Cliente HTTP compartido (fake_store_api/platzi_client.py)
+PLATZI_API_TIMEOUT = config('PLATZI_API_TIMEOUT', default=20, cast=int)
+PLATZI_API_POOL_CONNECTIONS = config('PLATZI_API_POOL_CONNECTIONS', default=10, cast=int)
+PLATZI_API_POOL_MAXSIZE = config('PLATZI_API_POOL_MAXSIZE', default=20, cast=int)
+# Peticiones simultáneas al descargar el catálogo completo
+PLATZI_API_MAX_CONCURRENCY = config('PLATZI_API_MAX_CONCURRENCY', default=4, cast=int)
+# Circuit breaker por endpoint: fallos seguidos para abrirlo y segundos hasta
+# la llamada de prueba. Mientras tanto se sirve la última respuesta buena,
+# como mucho PLATZI_STALE_TTL segundos después de obtenerla.
+PLATZI_CIRCUIT_FAILURE_THRESHOLD = config('PLATZI_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+PLATZI_CIRCUIT_RECOVERY_TIMEOUT = config('PLATZI_CIRCUIT_RECOVERY_TIMEOUT', default=30, cast=int)
+PLATZI_STALE_TTL = config('PLATZI_STALE_TTL', default=86400, cast=int)
+# Caché de productos por id (LRU): segundos de validez y número máximo de entradas
+PRODUCT_CACHE_TTL = config('PRODUCT_CACHE_TTL', default=60, cast=int)
+PRODUCT_CACHE_MAX_ENTRIES = config('PRODUCT_CACHE_MAX_ENTRIES', default=500, cast=int)
+# Vistas asíncronas (fake_store_api/async_views.py); requieren un servidor ASGI
+PLATZI_ASYNC_VIEWS = config('PLATZI_ASYNC_VIEWS', default=False, cast=bool)
+# Segundos que se reutiliza la lista de categorías antes de volver a pedirla
+PLATZI_CATEGORIES_CACHE_TTL = config('PLATZI_CATEGORIES_CACHE_TTL', default=300, cast=int)
+# Directorio para agrupar entre workers las descargas del catálogo que
+# coinciden en el tiempo (fake_store_api/single_flight.py). Vacío: solo
+# dentro de cada proceso.
+SINGLE_FLIGHT_LOCK_DIR = config('SINGLE_FLIGHT_LOCK_DIR', default='')
+# Grabación del tráfico con la API (fake_store_api/grabacion.py): '' va a la
+# red, 'record' guarda cada respuesta en PLATZI_CASSETTE_DIR y 'replay' las
+# sirve desde ahí sin conexión, con PLATZI_REPLAY_LATENCY segundos de espera.
+# Un directorio relativo se toma desde BASE_DIR.
+PLATZI_TRANSPORT_MODE = config('PLATZI_TRANSPORT_MODE', default='')
+PLATZI_CASSETTE_DIR = os.path.join(BASE_DIR, config('PLATZI_CASSETTE_DIR', default='grabaciones'))
+PLATZI_REPLAY_LATENCY = config('PLATZI_REPLAY_LATENCY', default=0, cast=float)
+
+# Caché de Django: tarjetas de productos y páginas del catálogo para usuarios
+# anónimos. Con varios workers conviene un backend compartido para que la
+# invalidación al editar llegue a todos, p. ej.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# CACHE_LOCATION=/var/tmp/platzi_cache
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+# Segundos que se reutiliza el HTML de cada tarjeta (la clave ya incluye updatedAt)
+CATALOG_CARD_CACHE_TTL = config('CATALOG_CARD_CACHE_TTL', default=600, cast=int)
+# Segundos que se sirve la página completa a anónimos; 0 la desactiva
+CATALOG_PAGE_CACHE_TTL = config('CATALOG_PAGE_CACHE_TTL', default=60, cast=int)
+# Enviar el catálogo en trozos según llegan las páginas de la API en lugar de
+# esperar a tenerlo completo (fake_store_api/streaming.py)
+CATALOG_STREAMING = config('CATALOG_STREAMING', default=False, cast=bool)
+
+# Validación de URLs de imágenes (fake_store_api/imagenes.py)
+IMAGE_CHECK_TIMEOUT = config('IMAGE_CHECK_TIMEOUT', default=5, cast=float)
+IMAGE_CHECK_HOST_TIMEOUTS = {
+    # 'i.imgur.com': 2,
+}
+IMAGE_CHECK_OK_TTL = config('IMAGE_CHECK_OK_TTL', default=3600, cast=int)
+IMAGE_CHECK_FAIL_TTL = config('IMAGE_CHECK_FAIL_TTL', default=300, cast=int)
+# Aceptar la URL sin esperar y comprobarla en segundo plano
+IMAGE_CHECK_DEFERRED = config('IMAGE_CHECK_DEFERRED', default=False, cast=bool)
+
+# Origen del catálogo: 'api' consulta la API en cada petición, 'local' lee las
+# tablas que llena `python manage.py sync_catalog`.
+CATALOG_SOURCE = config('CATALOG_SOURCE', default='api')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication con la búsqueda del token en caché
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -129,20 +229,27 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
+    # Límites compartidos por todos los workers (fake_store_api/throttling.py)
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'fake_store_api.throttling.SharedAnonRateThrottle',
+        'fake_store_api.throttling.SharedUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        # Vistas HTML que llaman a la API de Platzi, por usuario o IP
+        'platzi': config('PLATZI_THROTTLE_RATE', default='120/min'),
     }
 }
+# Archivo SQLite con los contadores de los límites de peticiones, común a
+# todos los workers de la máquina. Una ruta relativa se toma desde BASE_DIR.
+THROTTLE_DB_PATH = os.path.join(BASE_DIR, config('THROTTLE_DB_PATH', default='throttle.sqlite3'))
 
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 SESSION_COOKIE_AGE = 1209600
-SESSION_SAVE_EVERY_REQUEST = True
+# La sesión solo se guarda cuando cambia; el carrito ya no vive en ella
+SESSION_SAVE_EVERY_REQUEST = False
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
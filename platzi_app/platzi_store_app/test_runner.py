@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class PlatziTestRunner(DiscoverRunner):
+    """
+    Los tests guardan los límites de peticiones en la memoria del proceso,
+    no en el archivo que comparten los workers de la aplicación.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._limites = override_settings(THROTTLE_DB_PATH=':memory:')
+        self._limites.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._limites.disable()
+        super().teardown_test_environment(**kwargs)